@@ -1,30 +1,99 @@
 import numpy as np
 import random
+import time
+from contextlib import nullcontext
+import psu_coverage
 
 class Algorithm(object):
     '''
     parent class for all algorithms to define commonly used methods
     '''
 
-    def __init__(self, psu_dict, order, decode_dict):
+    def __init__(self, psu_dict, order, decode_dict, coverage=None, vectorized=False, initial_state="random",
+                 neighborhood="full", seed=None, cost_cache=None, deadline=None, stop_event=None, callback=None, instrumentation=None):
         '''
         initialize algorithm with psu_dict, order list and dict to decode items
+        optional keyword arguments (passed through by all subclasses):
+            coverage - precomputed psu_coverage.Coverage of psu_dict and order, built here if None
+                       (pass the same object to several algorithms to build the bitmasks only once)
+            vectorized - if True the whole neighborhood of a state is scored with NumPy array operations instead of
+                         one move at a time (same results, used by the steepest ascent searches)
+            initial_state - "random" (default) or "greedy": construction used by get_initial_state
+            neighborhood - "full" (default): every PSU in every slot, or "focused": only the moves that can lower the cost
+                           (see psu_coverage.Coverage_State.focused_moves), used by the hill climbing searches
+            seed - seed (int) or random.Random instance of the random number generator of the algorithm, all random decisions of
+                   the algorithm are drawn from it (child streams for restarts/beams/processes via get_child_seeds),
+                   if None a seed is drawn from the global random module, the seed used is kept in self.seed
+            cost_cache - memoization of the cost of whole states (calculate_cost) keyed by the canonical state:
+                         None (default, no cache), maximum number of cached states or a psu_coverage.Cost_Cache to share
+                         (built for the same coverage, which has to be passed as well, ValueError otherwise)
+                         opt-in: single slot moves are always scored incrementally, the cache is only for whole states
+            deadline - time.time() value at which the search stops and returns its current best state (None: no limit)
+            stop_event - object with is_set() (e.g. threading/multiprocessing Event), the search stops once it is set
+            callback - function called as callback(state, cost) after every iteration of the search
+            instrumentation - instrumentation.Instrumentation collecting counters, phase times and the search trace (None: disabled)
         '''
         self.psu_dict = psu_dict
         self.order = order
         self.decode_dict = decode_dict
+        self.coverage = coverage if coverage is not None else psu_coverage.Coverage(psu_dict, order)
+        self.vectorized = vectorized
+        if initial_state not in ("random", "greedy"):
+            raise ValueError('initial_state must be "random" or "greedy", not {!r}'.format(initial_state))
+        self.initial_state = initial_state
+        if neighborhood not in ("full", "focused"):
+            raise ValueError('neighborhood must be "full" or "focused", not {!r}'.format(neighborhood))
+        self.neighborhood = neighborhood
+        if cost_cache is not None and not isinstance(cost_cache, psu_coverage.Cost_Cache):
+            cost_cache = psu_coverage.Cost_Cache(self.coverage, cost_cache)
+        elif cost_cache is not None and cost_cache.coverage is not self.coverage:
+            # entries of another psu_dict or order would be wrong costs for this one
+            raise ValueError("cost_cache was built for another coverage, pass the coverage of the cache as well")
+        self.cost_cache = cost_cache
+        if isinstance(seed, random.Random):
+            self.seed = None  # generator given by the caller, its seed is not known
+            self.rng = seed
+        else:
+            self.seed = seed if seed is not None else random.getrandbits(32)
+            self.rng = random.Random(self.seed)
+        self.deadline = deadline
+        self.stop_event = stop_event
+        self.callback = callback
+        self.instrumentation = instrumentation
 
-    def get_initial_state(self, psu_dict, order):
+    def get_initial_state(self, psu_dict, order, rng=None):
         '''
-        get a random initial state
+        get a random initial state (or a greedy set cover with random tie breaking if initial_state is "greedy")
+        both start with the forced PSUs (sole holders of an order item, see psu_coverage.Coverage), the random state is
+        filled up with randomly sampled other PSUs
         parameters: psu_dict - dictionary of PSUs (key) and the numerically encoded items they hold (value)
                     order - list of numerically encoded order
+                    rng - random number generator providing sample (random.Random instance), default is the generator of the algorithm
         returns: initial_state - random initial state as a list of length equal to the number of items in order 
                 --> idea: we need one PSU for every item in the order (worst case)
         '''
-        return random.sample(list(psu_dict.keys()), len(order)) 
+        if rng is None:
+            rng = self.rng
+        with self.timed("initial state"):
+            if self.initial_state == "greedy":
+                return psu_coverage.greedy_state(self.coverage, psu_dict, len(order), rng)
+            forced = self.coverage.forced
+            pinned = set(forced)
+            others = [psu for psu in psu_dict if psu not in pinned]
+            # after the PSU reduction there can be fewer PSUs than order items: remaining positions get the placeholder (no PSU)
+            num_sampled = min(len(order), len(psu_dict)) - len(forced)
+            return forced + rng.sample(others, num_sampled) + [0]*(len(order) - len(forced) - num_sampled)
 
 
+    def get_child_seeds(self, n):
+        '''
+        seeds of n independent child random number generators (one per restart, beam or process)
+        derived in order from the generator of the algorithm, so they do not depend on the number of worker processes
+        parameter: n - number of seeds
+        returns: list of n seeds (32 bit integers)
+        '''
+        return [self.rng.getrandbits(32) for _ in range(n)]
+
     def get_neighbors(self, state, psu_dict):
         '''
         get neighbors of current state
@@ -32,16 +101,46 @@ class Algorithm(object):
                     psu_dict - filtered dictionary of PSUs (key) and the numerically encoded items they hold (value)
         returns: neighbors - list of all neighboring states of the given current state
                 --> idea: neighboring states are states with only one PSU different from current state
+                --> materializes every neighbor, prefer iterating over iter_moves and only applying the accepted move
+        '''
+        return [self.apply_move(state, move) for move in self.iter_moves(state, psu_dict)]
+
+    def iter_moves(self, state, psu_dict):
+        '''
+        lazily generate the neighborhood of current state as moves, without copying the state
+        parameters: state - current state (list of PSU ids)
+                    psu_dict - filtered dictionary of PSUs (key) and the numerically encoded items they hold (value)
+        yields: (i, psu) - move that replaces the PSU at position i of state by psu (same order as get_neighbors)
         '''
-        neighbors = []
         # for every position in the state
         for i in range(len(state)):
             # every variation from the current psu at that state position is a neighbor of the current state
             for psu in psu_dict:
-                temp_state = state.copy()
-                temp_state[i] = psu
-                neighbors.append(temp_state)
-        return neighbors 
+                yield i, psu
+
+    def get_moves(self, coverage_state, psu_dict):
+        '''
+        moves of the neighborhood of the current state for the searches working on a Coverage_State
+        parameters: coverage_state - psu_coverage.Coverage_State of the current state
+                    psu_dict - filtered dictionary of PSUs (key) and the numerically encoded items they hold (value)
+        returns: iterable of (i, psu) moves - the focused neighborhood if neighborhood is "focused" (and psu_dict is the
+                 one of this algorithm), else the full neighborhood of iter_moves
+        '''
+        if self.neighborhood == "focused" and psu_dict is self.psu_dict:
+            return coverage_state.focused_moves()
+        return self.iter_moves(coverage_state.state, psu_dict)
+
+    def apply_move(self, state, move):
+        '''
+        materialize the neighbor state of a move
+        parameters: state - current state (list of PSU ids), not changed
+                    move - (i, psu) tuple as generated by iter_moves
+        returns: neighbor - copy of state with position i replaced by psu
+        '''
+        i, psu = move
+        neighbor = state.copy()
+        neighbor[i] = psu
+        return neighbor
 
     def calculate_cost(self, state, psu_dict, order):
         '''
@@ -52,12 +151,11 @@ class Algorithm(object):
         returns: cost - cost associated with current state based on number of PSUs (non zero PSU ids in state) 
                         and number of provided items (items of order satisfied by current state)
         '''
-        # get number of items of the order that are not the items provided by the psus
-        missing_items = len(set(order) - set([item for psu in state for item in psu_dict[psu]]))
-
-        state = np.asarray(state) # for easier indexing
-        # calculate cost - missing items are counted 10 times compared to number of PSUs required
-        return missing_items*10 + len(state[state!=0])
+        # missing items are counted 10 times compared to number of PSUs required
+        # psu_dict and order are already encoded as bitmasks in self.coverage (built once per psu_dict and order)
+        if self.cost_cache is not None:
+            return self.cost_cache.cost(state)
+        return self.coverage.cost(state)
         
     def get_min_cost_neighbor(self, neighbors, psu_dict, order, state):
         '''
@@ -75,8 +173,99 @@ class Algorithm(object):
 
         # return neighbor with minimum cost or False if min_cost is not lower than current state cost
         return neighbors[idx] if min_cost < self.calculate_cost(state, psu_dict, order) else False
+
+    def get_min_cost_move(self, coverage_state, psu_dict):
+        '''
+        method to get the single slot move with lowest cost without building the neighbor states
+        parameters: coverage_state - psu_coverage.Coverage_State of the current state
+                    psu_dict - filtered dictionary of PSUs (key) and the numerically encoded items they hold (value)
+        returns: (i, psu, cost) of the least cost neighbor (slot i replaced by psu) or False if no neighbor has lower cost than current state
+        '''
+        if self.neighborhood == "focused" and psu_dict is self.psu_dict:
+            move = coverage_state.min_cost_move_focused()
+            if move is None:
+                return False
+            i, psu, cost = move
+        elif self.vectorized and psu_dict is self.psu_dict:
+            i, psu, cost = coverage_state.min_cost_move_vectorized()
+        else:
+            i, psu, cost = coverage_state.min_cost_move(psu_dict)
+        return (i, psu, cost) if cost < coverage_state.cost() else False
+
+    def hill_climb(self, state, psu_dict):
+        '''
+        steepest ascent hill climbing from the given state
+        parameters: state - state from which to start hill-climbing
+                    psu_dict - filtered dictionary of PSUs (key) and the numerically encoded items they hold (value)
+        returns: state - local optimum reached from state
+        '''
+        # coverage counts of the current state are updated in place, every neighbor cost is a delta to the current state
+        coverage_state = psu_coverage.Coverage_State(self.coverage, state)
+        stats = self.instrumentation
+        # in every iteration select the neighbor with lowest cost
+        # done if there is no neighbor with lower cost than current state (or if the search is stopped)
+        while not self.should_stop():
+            if stats is None:
+                move = self.get_min_cost_move(coverage_state, psu_dict)
+            else:
+                num_moves = self.get_neighborhood_size(coverage_state, psu_dict)
+                stats.count("neighbors generated", num_moves)
+                stats.count("cost evaluations", num_moves)
+                with stats.phase("costing"):
+                    move = self.get_min_cost_move(coverage_state, psu_dict)
+            if not move:
+                break
+            i, psu, cost = move
+            if stats is None:
+                coverage_state.apply(i, psu) # update state with new state
+            else:
+                with stats.phase("neighbor generation"):
+                    coverage_state.apply(i, psu)
+                stats.count("accepted moves")
+            self.report(coverage_state.state, cost)
+        return coverage_state.state
+
+    def get_neighborhood_size(self, coverage_state, psu_dict):
+        '''
+        number of moves scanned by get_min_cost_move for the current state (for the instrumentation)
+        parameters: coverage_state - psu_coverage.Coverage_State of the current state
+                    psu_dict - filtered dictionary of PSUs (key) and the numerically encoded items they hold (value)
+        returns: number of moves in the neighborhood
+        '''
+        if self.neighborhood == "focused" and psu_dict is self.psu_dict:
+            return sum(1 for _ in coverage_state.focused_moves())
+        return len(coverage_state.state) * len(psu_dict)
+
+    def timed(self, phase):
+        '''
+        context manager timing the enclosed block as phase of the instrumentation (does nothing if it is disabled)
+        only used around blocks that run at most once per iteration, never per evaluated move
+        parameter: phase - name of the phase (see instrumentation.PHASES)
+        '''
+        if self.instrumentation is None:
+            return nullcontext()
+        return self.instrumentation.phase(phase)
     
 
+    def should_stop(self):
+        '''
+        cooperative stop check, called by the searches once per iteration
+        returns: True if the deadline has passed or the stop event is set
+        '''
+        return (self.deadline is not None and time.time() >= self.deadline) or \
+               (self.stop_event is not None and self.stop_event.is_set())
+
+    def report(self, state, cost):
+        '''
+        report the current state of the search to the callback (if any), called by the searches once per iteration
+        parameters: state - current state (must not be modified by the callback)
+                    cost - cost of state
+        '''
+        if self.callback is not None:
+            self.callback(state, cost)
+        if self.instrumentation is not None:
+            self.instrumentation.record(cost)
+
     def post_processing(self, state, decode_dict, psu_dict, order):
         '''
         transform results to strings for output
@@ -87,23 +276,27 @@ class Algorithm(object):
         returns: provided_items_str - string to summarize number of items of order that are satisfied
                  num_psus - number of non zero PSUs in state (where 0 is placeholder for no PSU)
         '''
-        # get number of non zero PSUs in state (where 0 is placeholder for no PSU) 
-        state = np.asarray(state)
-        num_psus = "Number of PSUs required: {}".format(len(state[state!=0]))
+        with self.timed("post processing"):
+            # keep the result state for callers that need the PSU ids rather than the strings (e.g. batch mode)
+            self.result_state = list(state)
+
+            # get number of non zero PSUs in state (where 0 is placeholder for no PSU) 
+            state = np.asarray(state)
+            num_psus = "Number of PSUs required: {}".format(len(state[state!=0]))
 
-        # create result dict - PSUs of result state (keys) and decoded items they carry (values)
-        result_dict = {psu: [decode_dict[item] for item in psu_dict[psu]] for psu in state}
+            # create result dict - PSUs of result state (keys) and decoded items they carry (values)
+            result_dict = {psu: [decode_dict[item] for item in psu_dict[psu]] for psu in state}
         
-        # get number of items of the order that are provided by the result state PSUs 
-        provided_items = set([item for psu in state for item in psu_dict[psu]])
+            # get number of items of the order that are provided by the result state PSUs 
+            provided_items = set([item for psu in state for item in psu_dict[psu]])
 
-        # create a string from result_dict - every line one PSU with its items 
-        result_str = "\n".join(["{}:\t{}".format(psu ,", ".join([item for item in result_dict[psu]])) for psu in state if psu != 0])
+            # create a string from result_dict - every line one PSU with its items 
+            result_str = "\n".join(["{}:\t{}".format(psu ,", ".join([item for item in result_dict[psu]])) for psu in state if psu != 0])
         
-        # create string to summarize number of items of order that are satisfied
-        provided_items_str = "Provided Items: {}/{}".format(len(provided_items), len(order))
+            # create string to summarize number of items of order that are satisfied
+            provided_items_str = "Provided Items: {}/{}".format(len(provided_items), len(order))
         
-        return provided_items_str, num_psus, result_str
+            return provided_items_str, num_psus, result_str
 
    
 
@@ -0,0 +1,190 @@
+'''
+headless batch mode: solve many order files against one problem file without the GUI
+the problem file is parsed once, every order is filtered/reduced and solved with the chosen algorithm
+and one result row (JSON lines or CSV) is written per order as soon as it is solved
+
+usage: python batch.py files/problem1.txt "files/order*.txt" --algorithm hill-climbing --format csv --workers 4
+'''
+import file_parser, problem_cache, preprocessing, hill_climbing, first_choice_hill_climbing, simulated_annealing, \
+       random_restart_hill_climbing, local_beam_search, greedy, branch_and_bound
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import csv
+import glob
+import json
+import os
+import random
+import sys
+import time
+import numpy as np
+
+# algorithm name (command line) - (algorithm class, takes number of start states, keyword arguments)
+ALGORITHMS = {"hill-climbing": (hill_climbing.Hill_Climbing, False, {'vectorized': True}),
+              "first-choice-hill-climbing": (first_choice_hill_climbing.First_Choice_Hill_Climbing, False, {}),
+              "simulated-annealing": (simulated_annealing.Simulated_Annealing, False, {}),
+              "random-restart-hill-climbing": (random_restart_hill_climbing.Random_Restart_Hill_Climbing, True, {'vectorized': True}),
+              "local-beam-search": (local_beam_search.Local_Beam_Search, True, {'vectorized': True}),
+              "greedy": (greedy.Greedy, False, {}),
+              "branch-and-bound": (branch_and_bound.Branch_And_Bound, False, {})}
+
+# algorithms that can search the focused neighborhood (--neighborhood focused)
+FOCUSED_ALGORITHMS = ["hill-climbing", "first-choice-hill-climbing", "random-restart-hill-climbing"]
+
+FIELDS = ["order", "algorithm", "seed", "order items", "ignored items", "provided items", "number of PSUs", "PSUs", "duration [sec.]", "error"]
+
+# problem data of a worker process, set once per worker by init_worker
+worker_data = None
+
+def init_worker(problem, algorithm, options):
+    '''
+    initializer of the worker processes: the problem is sent once per worker, not once per order
+    (a problem loaded from the cache arrives as the path of its cache entry and is memory-mapped, see problem_cache.Problem)
+    '''
+    global worker_data
+    worker_data = (problem, algorithm, options)
+
+
+def solve(problem, order, algorithm, options, seed):
+    '''
+    preprocess and solve one (encoded) order
+    parameters: problem - problem_cache.Problem (CSR arrays of the problem and its inverted item index)
+                order - list of numerically encoded order items
+                algorithm - name of the algorithm (see ALGORITHMS)
+                options - dict of start_states, time_budget and neighborhood (see command line options),
+                          optionally initial_state ("random" or "greedy", default "random") and deadline (time.time() value
+                          at which the search returns its best state so far, see algorithm.Algorithm)
+                seed - seed of the algorithm
+    returns: alg - algorithm object after the run (the solution is in alg.result_state)
+             result - post processed result of the run
+    '''
+    # same preprocessing as the GUI: relevant PSUs (looked up in the CSR arrays), reduced, zero placeholder for no PSU
+    filtered_psu_dict, _ = preprocessing.reduce_psus(problem.filter_psus(order), order)
+    filtered_psu_dict[0] = []
+
+    alg_class, takes_start_states, kwargs = ALGORITHMS[algorithm]
+    args = (str(options["start_states"]),) if takes_start_states else ()
+    if alg_class is branch_and_bound.Branch_And_Bound:
+        kwargs = dict(kwargs, time_budget=options["time_budget"])
+    if options["neighborhood"] == "focused" and algorithm in FOCUSED_ALGORITHMS:
+        kwargs = dict(kwargs, neighborhood="focused")
+    if options.get("initial_state", "random") != "random":
+        kwargs = dict(kwargs, initial_state=options["initial_state"])
+    if options.get("deadline") is not None:
+        kwargs = dict(kwargs, deadline=options["deadline"])
+    alg = alg_class(filtered_psu_dict, order, problem.decode_dict, *args, seed=seed, **kwargs)
+    return alg, alg.run()
+
+
+def solve_order(path, seed):
+    '''
+    parse, preprocess and solve one order file with the problem of this process
+    parameters: path - path of the order file
+                seed - seed of the algorithm for this order
+    returns: row - dict with the result for the order (keys: FIELDS)
+    '''
+    problem, algorithm, options = worker_data
+    row = dict.fromkeys(FIELDS, "")
+    row.update({"order": path, "algorithm": algorithm, "seed": seed})
+
+    start = time.perf_counter()
+    order, missing_items = file_parser.read_order(path, problem.encode_dict)
+    if order is None:
+        row["error"] = "could not read order file"
+        return row
+    if not order:
+        # none of the items is in the inventory, nothing to solve
+        row.update({"order items": 0, "ignored items": " ".join(missing_items), "provided items": 0, "number of PSUs": 0,
+                    "duration [sec.]": np.round(time.perf_counter() - start, decimals=4)})
+        return row
+
+    try:
+        alg, result = solve(problem, order, algorithm, options, seed)
+    except Exception as error:
+        # one failing order does not stop the batch, the error is reported in its row
+        row.update({"order items": len(order), "ignored items": " ".join(missing_items),
+                    "duration [sec.]": np.round(time.perf_counter() - start, decimals=4),
+                    "error": "{}: {}".format(type(error).__name__, error)})
+        return row
+
+    psus = [int(psu) for psu in alg.result_state if psu != 0]
+    row.update({"order items": len(order),
+                "ignored items": " ".join(missing_items),
+                "provided items": int(result[0].split(": ")[1].split("/")[0]),
+                "number of PSUs": len(psus),
+                "PSUs": " ".join(str(psu) for psu in psus),
+                "duration [sec.]": np.round(time.perf_counter() - start, decimals=4)})
+    return row
+
+
+def find_orders(pattern):
+    '''
+    order files to solve
+    parameter: pattern - directory (all .txt files containing "order" in it) or glob pattern
+    returns: sorted list of order file paths
+    '''
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*order*.txt")
+    return sorted(glob.glob(pattern))
+
+
+def main(argv=None):
+    '''
+    command line entry point, returns the exit code
+    '''
+    parser = argparse.ArgumentParser(description="Solve many order files against one problem file (headless).")
+    parser.add_argument("problem", help="path of the problem .txt file")
+    parser.add_argument("orders", help='directory of order files or glob pattern, e.g. "files/order*.txt"')
+    parser.add_argument("--algorithm", choices=sorted(ALGORITHMS), default="hill-climbing")
+    parser.add_argument("--start-states", type=int, default=25, help="number of start states for random restart hill climbing and local beam search")
+    parser.add_argument("--time-budget", type=float, default=10.0, help="time budget in seconds for branch and bound")
+    parser.add_argument("--neighborhood", choices=["full", "focused"], default="full",
+                        help="neighborhood of the hill climbing variants: every PSU in every slot or only moves that can lower the cost")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--output", help="output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes orders are solved on")
+    parser.add_argument("--cache-dir", help="directory of the compiled problem cache (default: .problem_cache next to the problem file)")
+    parser.add_argument("--seed", type=int, help="seed from which the per-order seeds are derived")
+    args = parser.parse_args(argv)
+
+    # parse problem once (or load it from the cache), it is reused for every order (and sent once to every worker)
+    problem = problem_cache.open_problem(args.problem, args.cache_dir)
+    if problem is None:
+        parser.error("could not read problem file {}".format(args.problem))
+    paths = find_orders(args.orders)
+    if not paths:
+        parser.error("no order files found for {}".format(args.orders))
+
+    # per-order seeds are derived in file order, so results do not depend on the number of workers
+    seed_rng = random.Random(args.seed if args.seed is not None else random.getrandbits(32))
+    seeds = [seed_rng.getrandbits(32) for _ in paths]
+    options = {"start_states": args.start_states, "time_budget": args.time_budget, "neighborhood": args.neighborhood}
+    initargs = (problem, args.algorithm, options)
+
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        if args.format == "csv":
+            writer = csv.DictWriter(output, fieldnames=FIELDS)
+            writer.writeheader()
+            write = writer.writerow
+        else:
+            write = lambda row: output.write(json.dumps(row) + "\n")
+
+        if args.workers > 1:
+            with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=initargs) as executor:
+                futures = [executor.submit(solve_order, path, seed) for path, seed in zip(paths, seeds)]
+                for future in as_completed(futures):
+                    write(future.result())
+                    output.flush()
+        else:
+            init_worker(*initargs)
+            for path, seed in zip(paths, seeds):
+                write(solve_order(path, seed))
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+'''
+reproducible benchmark suite: generates synthetic problems and orders (see synthetic.py) across sizes and runs the algorithms
+on them with fixed seeds through the Comparator, one result row per (instance, algorithm) with the columns of the
+Comparator result plus mean cost evaluations and peak memory
+results are written as .csv in a fixed order (instances, then algorithms), so files of two versions can be diffed (or compared with --baseline)
+
+usage: python benchmark.py --profile smoke --output benchmark_smoke.csv [--baseline old_results.csv]
+'''
+import synthetic, preprocessing, comparator, hill_climbing, first_choice_hill_climbing, simulated_annealing, \
+       random_restart_hill_climbing, local_beam_search, greedy, branch_and_bound
+import argparse
+import sys
+import time
+import pandas as pd
+
+# algorithm configurations of the profiles (same format as Comparator.get_configurations)
+# the slow full neighborhood scans without NumPy are left out, the focused neighborhood covers first choice hill climbing
+FAST_CONFIGURATIONS = [(greedy.Greedy, (), {}),
+                       (hill_climbing.Hill_Climbing, (), {'vectorized': True}),
+                       (hill_climbing.Hill_Climbing, (), {'neighborhood': 'focused'}),
+                       (first_choice_hill_climbing.First_Choice_Hill_Climbing, (), {'neighborhood': 'focused'}),
+                       (simulated_annealing.Simulated_Annealing, (), {'vectorized': True}),
+                       (random_restart_hill_climbing.Random_Restart_Hill_Climbing, ("25",), {'neighborhood': 'focused'}),
+                       (local_beam_search.Local_Beam_Search, ("25",), {'vectorized': True}),
+                       (branch_and_bound.Branch_And_Bound, (), {'time_budget': 2.0})]
+
+# instance parameters: name, number of PSUs, number of items, (min, max) items per PSU, order length, popularity skew
+INSTANCE_FIELDS = ["instance", "psus", "items", "items per psu", "order length", "skew"]
+
+# profiles: instances, repetitions per algorithm and instance, algorithm configurations
+PROFILES = {
+    # quick check (a few seconds): two small instances
+    "smoke": {"instances": [("small", 500, 200, (1, 6), 10, 1.0),
+                            ("medium", 2000, 1000, (1, 8), 30, 1.0)],
+              "repetitions": 2,
+              "configurations": FAST_CONFIGURATIONS},
+    # scaling in number of PSUs, order length and popularity skew (long running)
+    "scaling": {"instances": [("{}k psus, order {}, skew {}".format(psus // 1000, length, skew), psus, psus // 5, (1, 8), length, skew)
+                              for psus in (1000, 10000, 100000) for length in (20, 100) for skew in (0.0, 1.2)],
+                "repetitions": 2,
+                "configurations": FAST_CONFIGURATIONS},
+}
+
+
+def run_instance(instance, configurations, repetitions, seed):
+    '''
+    generate one instance and compare all algorithm configurations on it
+    parameters: instance - tuple of instance parameters (see INSTANCE_FIELDS)
+                configurations - algorithm configurations for the Comparator
+                repetitions - number of runs per configuration
+                seed - seed of the problem/order generator and of the Comparator
+    returns: result dataframe of the Comparator with the instance parameters as additional columns
+    '''
+    name, num_psus, num_items, items_per_psu, order_length, skew = instance
+    items, psus = synthetic.generate_problem(num_psus, num_items, items_per_psu, skew, seed)
+    encode_dict, decode_dict, psu_dict = synthetic.to_dicts(items, psus)
+    order = synthetic.generate_order(num_items, order_length, skew, seed + 1)
+
+    # same preprocessing as the GUI and batch mode
+    filtered_psu_dict, _ = preprocessing.reduce_psus(preprocessing.filter_psus(psu_dict, order, preprocessing.build_item_index(psu_dict)), order)
+    filtered_psu_dict[0] = []
+
+    comparison = comparator.Comparator(filtered_psu_dict, order, decode_dict, repetitions=repetitions, seed=seed,
+                                       instrument=True, memory=True, configurations=configurations)
+    comparison.compare_all()
+    result = comparison.result.rename_axis("algorithm").reset_index()
+    for field, value in zip(INSTANCE_FIELDS, (name, num_psus, num_items, "{}-{}".format(*items_per_psu), order_length, skew)):
+        result[field] = value
+    result["seed"] = seed
+    return result[INSTANCE_FIELDS + ["seed"] + [column for column in result.columns if column not in INSTANCE_FIELDS + ["seed"]]]
+
+
+def compare_with_baseline(results, baseline, threshold):
+    '''
+    compare results with the results of an older version
+    parameters: results, baseline - result dataframes of run_profile
+                threshold - relative increase of the duration reported as regression (e.g. 0.2: 20% slower)
+    returns: dataframe with number of PSUs and duration of both versions per (instance, algorithm) and a regression flag
+    '''
+    keys = ["instance", "algorithm"]
+    columns = ["mean number of PSUs", "duration [sec.]", "mean cost evaluations"]
+    merged = baseline[keys + columns].merge(results[keys + columns], on=keys, suffixes=(" (baseline)", ""))
+    merged["duration ratio"] = (merged["duration [sec.]"] / merged["duration [sec.] (baseline)"]).round(3)
+    merged["regression"] = (merged["mean number of PSUs"] > merged["mean number of PSUs (baseline)"]) | \
+                           (merged["duration ratio"] > 1 + threshold)
+    return merged
+
+
+def run_profile(profile, seed=0, progress=None):
+    '''
+    run all instances of a profile
+    parameters: profile - name of the profile (see PROFILES)
+                seed - base seed, instance c uses seed + c
+                progress - function called with a status string after every instance (None: silent)
+    returns: dataframe with one row per (instance, algorithm)
+    '''
+    settings = PROFILES[profile]
+    results = []
+    for c, instance in enumerate(settings["instances"]):
+        start = time.perf_counter()
+        results.append(run_instance(instance, settings["configurations"], settings["repetitions"], seed + c))
+        if progress is not None:
+            progress("{} done in {:.1f} sec.".format(instance[0], time.perf_counter() - start))
+    return pd.concat(results, ignore_index=True)
+
+
+def main(argv=None):
+    '''
+    command line entry point, returns the exit code (1 if --baseline is given and a regression was found)
+    '''
+    parser = argparse.ArgumentParser(description="Benchmark all algorithms on synthetic problems with fixed seeds.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="smoke")
+    parser.add_argument("--output", help="output .csv file (default: benchmark_<profile>.csv)")
+    parser.add_argument("--seed", type=int, default=0, help="base seed of the instances")
+    parser.add_argument("--baseline", help="results .csv of an older version to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown reported as regression (default 0.2)")
+    args = parser.parse_args(argv)
+
+    results = run_profile(args.profile, args.seed, progress=lambda status: print(status, file=sys.stderr))
+    output = args.output or "benchmark_{}.csv".format(args.profile)
+    results.to_csv(output, index=False)
+    print("results written to {}".format(output), file=sys.stderr)
+
+    if args.baseline:
+        comparison = compare_with_baseline(results, pd.read_csv(args.baseline), args.threshold)
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            print(comparison)
+        return 1 if comparison["regression"].any() else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
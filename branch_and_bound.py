@@ -0,0 +1,158 @@
+import algorithm, psu_coverage, preprocessing
+import time
+import numpy as np
+
+class Branch_And_Bound(algorithm.Algorithm):
+    '''
+    Exact solver: branch and bound over the filtered PSUs for the minimum number of PSUs providing all order items
+    returns a proven optimum if the search finishes within the time budget, else the best state found and its gap
+    '''
+
+    def __init__(self, psu_dict, order, decode_dict, time_budget=10.0, **kwargs):
+        '''
+        initialize algorithm object with psu_dict, order list and dict to decode items via parent class
+        (other keyword arguments are passed on to the parent class)
+            time_budget - seconds after which the search is stopped and the best state found so far is returned
+        '''
+        super().__init__(psu_dict, order, decode_dict, **kwargs)
+        self.name = "Branch and Bound"
+        self.time_budget = float(time_budget)
+        # results of the last run
+        self.upper_bound = None  # number of PSUs of the best state found
+        self.lower_bound = None  # proven lower bound of the number of PSUs
+        self.optimal = False
+        self.nodes = 0
+
+    def run(self):
+        '''
+        method to run the algorithm from the constructed algorithm object
+            returns: post precessed result - provided items, number of psus required, result state,
+                     status (optimal or gap between best state and lower bound)
+        '''
+        psu_dict = self.psu_dict
+        order = self.order
+        decode_dict = self.decode_dict
+        coverage = self.coverage
+
+        start = time.time()
+        self.stop_time = start + self.time_budget
+        if self.deadline is not None:
+            self.stop_time = min(self.stop_time, self.deadline)
+
+        # candidates: one PSU per distinct item set, PSUs whose items are a strict subset of another PSU's items are dropped
+        self.psus, self.masks = preprocessing.dominance_reduce([psu for psu in psu_dict if coverage.masks[psu]], coverage.masks)
+        # items no PSU holds can never be provided, they are not part of the search
+        target = 0
+        for mask in self.masks:
+            target |= mask
+        # holders of every order item as bitmask over candidate indices
+        self.holders = [0] * coverage.num_items
+        for c, mask in enumerate(self.masks):
+            for pos in coverage.item_positions[self.psus[c]]:
+                self.holders[pos] |= 1 << c
+
+        self.nodes = 0
+        self.aborted = False
+        if target == 0:
+            # nothing to provide (empty order or no PSU holds an order item): the empty state is a proven optimum
+            self.best = []
+            self.lower_bound = 0
+        else:
+            # forced candidates: sole holder of some item, part of every cover, chosen up front (never branched on)
+            forced = sorted(set(holders.bit_length() - 1 for holders in self.holders if psu_coverage.popcount(holders) == 1))
+            forced_mask = 0
+            for c in forced:
+                forced_mask |= self.masks[c]
+            # greedy set cover (starting with the forced candidates) as initial upper bound
+            index = {psu: c for c, psu in enumerate(self.psus)}
+            self.best = forced + [index[psu] for psu in psu_coverage.greedy_cover(coverage, self.psus, covered=forced_mask)]
+            self.lower_bound = len(forced) + self.get_lower_bound(target & ~forced_mask, 0)
+            self.search(target & ~forced_mask, forced, 0)
+
+        self.upper_bound = len(self.best)
+        if self.instrumentation is not None:
+            self.instrumentation.count("nodes", self.nodes)
+        self.optimal = not self.aborted or self.upper_bound == self.lower_bound
+        if self.optimal:
+            self.lower_bound = self.upper_bound
+
+        chosen = [self.psus[c] for c in self.best][:len(order)]
+        state = chosen + [0]*(len(order) - len(chosen))
+        self.report(state, self.calculate_cost(state, psu_dict, order))
+        provided_items_str, num_psus, result_str = self.post_processing(state, decode_dict, psu_dict, order)
+        if self.optimal:
+            status = "(optimal, {} nodes in {} sec.)".format(self.nodes, np.round(time.time()-start, decimals=4))
+        else:
+            status = "(time limit: gap {}%, lower bound {} PSUs, {} nodes)".format(np.round(self.get_gap()*100, decimals=2), self.lower_bound, self.nodes)
+        return provided_items_str, num_psus, result_str, status
+
+    def get_gap(self):
+        '''
+        returns: relative gap between best state found and lower bound of the last run (0 if optimal)
+        '''
+        return (self.upper_bound - self.lower_bound) / self.upper_bound if self.upper_bound else 0.0
+
+    def search(self, uncovered, chosen, excluded):
+        '''
+        depth first branch and bound
+        parameters: uncovered - bitmask of order items not provided by chosen
+                    chosen - list of chosen candidate indices
+                    excluded - bitmask of candidate indices that must not be chosen in this subtree
+        '''
+        self.nodes += 1
+        if uncovered == 0:
+            if len(chosen) < len(self.best):
+                self.best = list(chosen)
+            return
+        # check the time every 256 nodes
+        if self.nodes & 255 == 0 and (time.time() >= self.stop_time or self.should_stop()):
+            self.aborted = True
+        if self.aborted:
+            return
+        if len(chosen) + self.get_lower_bound(uncovered, excluded) >= len(self.best):
+            return
+
+        # branch on the uncovered item with the fewest remaining holders: one of them has to be chosen
+        allowed = ~excluded
+        pos = min((pos for pos in range(uncovered.bit_length()) if uncovered >> pos & 1),
+                  key=lambda pos: psu_coverage.popcount(self.holders[pos] & allowed))
+        holders = self.holders[pos] & allowed
+        # most promising holders (most uncovered items) first
+        branches = sorted((c for c in range(holders.bit_length()) if holders >> c & 1),
+                          key=lambda c: -psu_coverage.popcount(self.masks[c] & uncovered))
+        for c in branches:
+            chosen.append(c)
+            self.search(uncovered & ~self.masks[c], chosen, excluded)
+            chosen.pop()
+            # subsets containing c have been searched, the remaining branches exclude it
+            excluded |= 1 << c
+
+    def get_lower_bound(self, uncovered, excluded):
+        '''
+        lower bound on the number of additional PSUs needed to provide the uncovered items (without an LP)
+        parameters: uncovered - bitmask of order items still to provide
+                    excluded - bitmask of candidate indices that must not be chosen
+        returns: bound - maximum of two bounds (large number if some item has no allowed holder, 0 if nothing is uncovered):
+                    - number of uncovered items divided by the most uncovered items a single PSU provides
+                    - number of uncovered items that pairwise share no holder (every one needs its own PSU)
+        '''
+        if uncovered == 0:
+            return 0
+        allowed = ~excluded
+        positions = [pos for pos in range(uncovered.bit_length()) if uncovered >> pos & 1]
+        holders = [self.holders[pos] & allowed for pos in positions]
+        if not all(holders):
+            return len(self.psus) + 1
+
+        max_gain = max(psu_coverage.popcount(self.masks[c] & uncovered) for c in range(len(self.masks)) if allowed >> c & 1)
+        bound = -(-len(positions) // max_gain)
+
+        # greedily pack items with few holders whose holder sets are disjoint
+        used = 0
+        disjoint = 0
+        for item_holders in sorted(holders, key=psu_coverage.popcount):
+            if not item_holders & used:
+                used |= item_holders
+                disjoint += 1
+        return max(bound, disjoint)
+
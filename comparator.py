@@ -1,5 +1,10 @@
-import hill_climbing, first_choice_hill_climbing, simulated_annealing, random_restart_hill_climbing, local_beam_search
+import hill_climbing, first_choice_hill_climbing, simulated_annealing, random_restart_hill_climbing, local_beam_search, greedy, branch_and_bound, psu_coverage, instrumentation
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import json
+import random
 import time
+import tracemalloc
 import pandas as pd
 import numpy as np
 
@@ -7,57 +12,223 @@ class Comparator(object):
     '''
     Class to compare all algorithms
     '''
-    def __init__(self, psu_dict, order, decode_dict):
-        ''' 
+    def __init__(self, psu_dict, order, decode_dict, workers=1, repetitions=1, seed=None, stop_event=None, callback=None, instrument=False,
+                 memory=False, configurations=None):
+        '''
         initialize the comparator object with: psu_dict, order, and decode_dict
+        optional: workers - number of worker processes the algorithm runs are scheduled on (1: run sequentially in this process)
+                  repetitions - number of runs per algorithm configuration, results are reported as mean/std/best
+                  seed - seed from which the seeds of the individual runs are derived (results do not depend on workers)
+                  stop_event - object with is_set(), once it is set no further runs are started (the result only contains finished runs)
+                  callback - function called as callback(finished runs, number of runs) after every finished run
+                  instrument - if True every run is instrumented (counters, phase times, trace), see download_stats and download_trace
+                               (the result gets a column with the mean number of cost evaluations)
+                  memory - if True every run is repeated with tracemalloc to measure its peak memory (the timed run is not traced)
+                  configurations - algorithm configurations to compare instead of the default ones (see get_configurations)
         '''
         self.psu_dict = psu_dict
         self.order = order
         self.decode_dict = decode_dict
+        self.workers = max(1, int(workers))
+        self.repetitions = max(1, int(repetitions))
+        self.seed = seed
+        self.stop_event = stop_event
+        self.callback = callback
+        self.instrument = instrument
+        self.memory = memory
+        self.configurations = configurations
+        self.instrumentation = []  # (algorithm name, seed, instrumentation dict) of every run of the last compare_all if instrumented
+
+    def get_configurations(self):
+        '''
+        algorithm configurations to compare
+        returns: list of (algorithm class, positional arguments after psu_dict/order/decode_dict, keyword arguments) tuples
+        '''
+        if self.configurations is not None:
+            return list(self.configurations)
+        configurations = [(greedy.Greedy, (), {}),
+                          (hill_climbing.Hill_Climbing, (), {'vectorized': True}),
+                          (hill_climbing.Hill_Climbing, (), {'vectorized': True, 'initial_state': 'greedy'}),
+                          (hill_climbing.Hill_Climbing, (), {'neighborhood': 'focused'}),
+                          (first_choice_hill_climbing.First_Choice_Hill_Climbing, (), {}),
+                          (first_choice_hill_climbing.First_Choice_Hill_Climbing, (), {'neighborhood': 'focused'}),
+                          (simulated_annealing.Simulated_Annealing, (), {}),
+                          (simulated_annealing.Simulated_Annealing, (), {'initial_state': 'greedy'})]
+        n_start_states = ["25","50","75","100"]  # algorithm instances with different number of start states
+        for n in n_start_states:
+            configurations.append((random_restart_hill_climbing.Random_Restart_Hill_Climbing, (n,), {'vectorized': True}))
+        configurations.append((random_restart_hill_climbing.Random_Restart_Hill_Climbing, ("100",), {'neighborhood': 'focused'}))
+        for n in n_start_states:
+            configurations.append((local_beam_search.Local_Beam_Search, (n,), {'vectorized': True}))
+        # exact solver, its lower bound is used to compute the optimality gap of all configurations
+        configurations.append((branch_and_bound.Branch_And_Bound, (), {'time_budget': 5.0}))
+        return configurations
 
     def compare_all(self):
         '''
-        creates instances of the different algorithms and creates a csv with an overview over the search results and durations
+        runs all algorithm configurations (repetitions times each, concurrently if workers > 1)
+        and creates a dataframe with an overview over the search results, cpu times and wall times
         '''
         psu_dict = self.psu_dict
         order = self.order
         decode_dict = self.decode_dict
+        configurations = self.get_configurations()
 
-        # create algorithm instances 
-        hill_climbing_alg = hill_climbing.Hill_Climbing(psu_dict, order, decode_dict)
-        first_choice_hill_climbing_alg = first_choice_hill_climbing.First_Choice_Hill_Climbing(psu_dict, order, decode_dict)
-        simulated_annealing_alg = simulated_annealing.Simulated_Annealing(psu_dict, order, decode_dict)
-        algorithms = [hill_climbing_alg, first_choice_hill_climbing_alg, simulated_annealing_alg]
-        n_start_states = ["25","50","75","100"]  # algorithm instances with different number of start states
-        for n in n_start_states:
-            algorithms.append(random_restart_hill_climbing.Random_Restart_Hill_Climbing(psu_dict, order, decode_dict, n))
-            
-        for n in n_start_states:
-            algorithms.append(local_beam_search.Local_Beam_Search(psu_dict, order, decode_dict, n))
+        # one task per (configuration, repetition), every task gets its own seed derived in task order
+        seed = self.seed if self.seed is not None else random.getrandbits(32)
+        seed_rng = random.Random(seed)
+        tasks = [(c, seed_rng.getrandbits(32)) for c in range(len(configurations)) for _ in range(self.repetitions)]
+
+        if self.workers > 1:
+            # psu_dict and order are sent once per worker process, the coverage bitmasks are built once per worker
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks)), initializer=init_worker,
+                                     initargs=(psu_dict, order, decode_dict, configurations, self.instrument, self.memory)) as executor:
+                futures = [executor.submit(run_task, task) for task in tasks]
+                runs = []
+                for future in futures:
+                    if self.stop_event is not None and self.stop_event.is_set():
+                        # runs that have not started yet are cancelled, running ones are finished by the executor
+                        for pending in futures:
+                            pending.cancel()
+                        break
+                    runs.append(future.result())
+                    self.report(len(runs), len(tasks))
+        else:
+            init_worker(psu_dict, order, decode_dict, configurations, self.instrument, self.memory)
+            runs = []
+            for task in tasks:
+                if self.stop_event is not None and self.stop_event.is_set():
+                    break
+                runs.append(run_task(task))
+                self.report(len(runs), len(tasks))
+
+        # best proven lower bound on the number of PSUs (from the exact solver)
+        lower_bounds = [run[5] for run in runs if run[5] is not None]
+        self.instrumentation = [(run[0], seed, run[6]) for (_, seed), run in zip(tasks, runs) if run[6] is not None]
+        lower_bound = max(lower_bounds) if lower_bounds else None
 
-        # create comparison result dict
+        # aggregate the repetitions of every configuration
         result_dict = {}
-        for alg in algorithms:
-            
-            start = time.time()
-            if not hasattr(alg, 'num_start_states'):
-                provided_items_str, num_psus, _ = alg.run()
-            else: 
-                provided_items_str, num_psus, _, n_states = alg.run()
-                alg.name = alg.name + " " + n_states
-            end = time.time()
-
-            items_provided = provided_items_str[16:].split('/') # get number of provided items and number of items in order from returned str
-            # for every algorithm safe in dict: percentage of provided items, number of psus used, time needed for calculation
-            result_dict[alg.name] = [int(items_provided[0])/int(items_provided[1])*100, num_psus[-2:], np.round(end-start, decimals=4)]
+        for c in range(len(configurations)):
+            config_runs = [run for (config, _), run in zip(tasks, runs) if config == c]
+            if not config_runs:
+                continue  # comparison was stopped before this configuration ran
+            name = config_runs[0][0]
+            provided, num_psus, cpu_times, wall_times = (np.array(values) for values in list(zip(*config_runs))[1:5])
+            # for every algorithm safe in dict: percentage of provided items, number of psus used (best, mean, std)
+            # and wall/cpu time needed for calculation (mean, std, best)
+            result_dict[name] = [np.mean(provided), np.min(num_psus), np.mean(num_psus), np.std(num_psus)] \
+                                + [np.round(stat, decimals=4) for times in (wall_times, cpu_times)
+                                   for stat in (np.mean(times), np.std(times), np.min(times))] \
+                                + [len(config_runs)]
+            # relative gap between mean number of PSUs and the lower bound (0: proven optimal)
+            gap = (np.mean(num_psus) - lower_bound) / np.mean(num_psus) * 100 if lower_bound else np.nan
+            result_dict[name].append(np.round(gap, decimals=2))
+            # seeds of the runs, every run can be reproduced by passing its seed to the algorithm
+            result_dict[name].append(" ".join(str(seed) for (config, seed) in tasks[:len(runs)] if config == c))
+            if self.instrument:
+                result_dict[name].append(np.mean([run[6]["counters"]["cost evaluations"] for run in config_runs]))
+            if self.memory:
+                result_dict[name].append(np.round(np.max([run[7] for run in config_runs]) / 2**20, decimals=3))
         # create result dataframe
-        self.result = pd.DataFrame.from_dict(result_dict, orient='index', columns=["items provided [%]","number of PSUs required", "duration [sec.]"])
+        columns = ["items provided [%]", "number of PSUs required", "mean number of PSUs", "std number of PSUs",
+                   "duration [sec.]", "std duration [sec.]", "best duration [sec.]",
+                   "cpu time [sec.]", "std cpu time [sec.]", "best cpu time [sec.]", "repetitions",
+                   "gap to lower bound [%]", "seeds"]
+        if self.instrument:
+            columns.append("mean cost evaluations")
+        if self.memory:
+            columns.append("peak memory [MB]")
+        self.result = pd.DataFrame.from_dict(result_dict, orient='index', columns=columns)
 
 
 
+    def report(self, finished, total):
+        '''
+        report the progress of compare_all to the callback (if any)
+        parameters: finished - number of finished runs
+                    total - number of runs
+        '''
+        if self.callback is not None:
+            self.callback(finished, total)
+
     def download(self, path):
         '''
         safe result dataframe as .cvs file
         parameter: path - path to which to safe the file
         '''
-        self.result.to_csv(path)
\ No newline at end of file
+        self.result.to_csv(path)
+
+    def download_stats(self, path):
+        '''
+        save counters and phase times of every instrumented run as .json file (list of one dict per run)
+        parameter: path - path to which to save the file
+        '''
+        stats = [dict(algorithm=name, seed=seed, **{key: value for key, value in run_stats.items() if key != "trace"})
+                 for name, seed, run_stats in self.instrumentation]
+        with open(path, "w") as file:
+            json.dump(stats, file, indent=2)
+
+    def download_trace(self, path):
+        '''
+        save the traces of all instrumented runs as one .csv file (one row per iteration of every run, to plot the convergence per algorithm)
+        parameter: path - path to which to save the file
+        '''
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["algorithm", "seed"] + instrumentation.TRACE_FIELDS)
+            for name, seed, run_stats in self.instrumentation:
+                writer.writerows([name, seed] + [row[field] for field in instrumentation.TRACE_FIELDS] for row in run_stats["trace"])
+
+
+# problem data of a worker process, set once per worker by init_worker
+worker_data = None
+
+def init_worker(psu_dict, order, decode_dict, configurations, instrument=False, memory=False):
+    '''
+    initializer of the worker processes: builds the coverage shared by all algorithm runs of the worker
+    '''
+    global worker_data
+    worker_data = (psu_dict, order, decode_dict, configurations, psu_coverage.Coverage(psu_dict, order), instrument, memory)
+
+def run_task(task):
+    '''
+    run one repetition of one algorithm configuration
+    parameter: task - (configuration index, seed) tuple
+    returns: (algorithm name, provided items [%], number of PSUs, cpu time, wall time, lower bound of exact solvers or None,
+              instrumentation dict or None, peak memory in bytes or None)
+    '''
+    psu_dict, order, decode_dict, configurations, coverage, instrument, memory = worker_data
+    c, seed = task
+    alg_class, args, kwargs = configurations[c]
+    # every run gets its own seed, all random decisions of the algorithm are drawn from it
+    alg = alg_class(psu_dict, order, decode_dict, *args, coverage=coverage, seed=seed, **kwargs)
+    if instrument:
+        alg.instrumentation = instrumentation.Instrumentation()
+    # cpu time of this process and wall time are measured separately, wall time is inflated if workers share cores
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    result = alg.run()
+    provided_items_str, num_psus = result[0], result[1]
+    if hasattr(alg, 'num_start_states'):
+        alg.name = alg.name + " " + result[3]
+    end = time.perf_counter()
+    end_cpu = time.process_time()
+    if alg.initial_state == "greedy":
+        alg.name = alg.name + " (greedy start)"
+    if alg.neighborhood == "focused":
+        alg.name = alg.name + " (focused)"
+
+    items_provided = provided_items_str[16:].split('/') # get number of provided items and number of items in order from returned str
+    num_psus = int(num_psus.split(':')[1])
+
+    peak_memory = None
+    if memory:
+        # same run again (same seed, so same search) with tracemalloc, which slows allocations down too much for the timed run
+        tracemalloc.start()
+        alg_class(psu_dict, order, decode_dict, *args, coverage=coverage, seed=seed, **kwargs).run()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return alg.name, int(items_provided[0])/int(items_provided[1])*100, num_psus, end_cpu-start_cpu, end-start, getattr(alg, 'lower_bound', None), \
+           alg.instrumentation.to_dict() if alg.instrumentation is not None else None, peak_memory
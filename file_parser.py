@@ -1,37 +1,88 @@
+import numpy as np
+from array import array
 
 
-def read_problem(path):
+class ProblemFormatError(ValueError):
+    '''
+    error in a problem file, knows the line number (1-based) where it occurred
+    '''
+
+    def __init__(self, message, line=None):
+        self.line = line
+        super().__init__("line {}: {}".format(line, message) if line is not None else message)
+
+
+def read_problem(path, raise_errors=False):
     '''
     helper method to read problem file 
         parameter: path - path of problem.txt file
+                   raise_errors - if True, errors are raised (ProblemFormatError with line number, OSError) instead of returning None
         returns: item encoding dict, item decoding dict, dict of PSUs and their items
     '''
-
-    try: 
-        if "problem" not in path:
-            raise NameError('name of file chosen does not contain "problem"')  # raise error if the name does not contain "problem"
-        # open file
-        with open(path, "r") as file:
-            lines = file.readlines()
-
-        # create items list, encoding and decoding dictionaries
-        items = lines.pop(0).split(' ')[:-1]  # pop the inventory list line and safe in items
-        encode_dict = {}
-        decode_dict = {}
-
-        for c, item in enumerate(items):
-            encode_dict[item] = c
-            decode_dict[c] = item
-
-        # create dict of PSUs with list of items they hold
-        lines.pop(0) # pop the empty line, between inventory and PSUs
-        psu_dict = {}
-        for c,l in enumerate(lines):
-            # psu_dict: key - PSU id (row number), value - list of numerically encoded items in the row 
-            psu_dict[c] = [encode_dict[item] for item in l.split(' ') if not item in '\n'] 
-    except:
+    try:
+        vocabulary, indptr, indices = parse_problem(path)
+    except (OSError, UnicodeDecodeError, ProblemFormatError):
+        if raise_errors:
+            raise
         return None, None, None # return None for encoding, decoding and psu dict if there is some problem with the chosen file
 
+    return to_dicts(vocabulary, indptr, indices)
+
+
+def parse_problem(path, chunk_size=1 << 22):
+    '''
+    streaming parser for problem files: the file is read in chunks of lines and items are encoded directly
+    into flat integer arrays (CSR layout), so memory stays close to the size of the result arrays
+        parameters: path - path of problem.txt file
+                    chunk_size - approximate number of bytes read at once
+        returns: vocabulary - list of item names (index is the numeric encoding)
+                 indptr, indices - numpy arrays in CSR layout: items of PSU c are indices[indptr[c]:indptr[c+1]]
+        raises: ProblemFormatError with the line of the error, OSError if the file cannot be read
+    '''
+    if "problem" not in path:
+        raise ProblemFormatError('name of file chosen does not contain "problem"')  # raise error if the name does not contain "problem"
+
+    with open(path, "r") as file:
+        # first line: inventory, numeric encoding of an item is its position
+        vocabulary = file.readline().split()
+        if not vocabulary:
+            raise ProblemFormatError("empty inventory", 1)
+        encode_dict = {item: c for c, item in enumerate(vocabulary)}
+        encode = encode_dict.__getitem__
+        # second line: empty line between inventory and PSUs
+        if file.readline().strip():
+            raise ProblemFormatError("expected an empty line between inventory and PSUs", 2)
+
+        # one line per PSU: PSU id is the row number, items are appended to one flat array
+        indices = array("i")
+        indptr = array("q", [0])
+        line_number = 2
+        lines = file.readlines(chunk_size)
+        while lines:
+            for line in lines:
+                line_number += 1
+                try:
+                    indices.extend(map(encode, line.split()))
+                except KeyError as error:
+                    raise ProblemFormatError("item {} is not in the inventory".format(error.args[0]), line_number) from None
+                indptr.append(len(indices))
+            lines = file.readlines(chunk_size)
+
+    return vocabulary, np.frombuffer(indptr, dtype=np.int64), np.frombuffer(indices, dtype=np.int32)
+
+
+def to_dicts(vocabulary, indptr, indices):
+    '''
+    convert the CSR layout of a problem to the dictionaries used by the GUI and the algorithms
+        parameters: vocabulary, indptr, indices - see parse_problem
+        returns: item encoding dict, item decoding dict, dict of PSUs (row numbers) and their items
+    '''
+    items = [str(item) for item in vocabulary]  # vocabulary may be a (memory-mapped) numpy array
+    encode_dict = {item: c for c, item in enumerate(items)}
+    decode_dict = dict(enumerate(items))
+    bounds = indptr.tolist()
+    flat = indices.tolist()
+    psu_dict = {c: flat[bounds[c]:bounds[c+1]] for c in range(len(bounds) - 1)}
     return encode_dict, decode_dict, psu_dict
 
 
@@ -1,17 +1,19 @@
-import algorithm
+import algorithm, psu_coverage
 
 class First_Choice_Hill_Climbing(algorithm.Algorithm):
     
-    def __init__(self, psu_dict, order, decode_dict):
+    def __init__(self, psu_dict, order, decode_dict, **kwargs):
         '''
         initialize algorithm object with psu_dict, order list and dict to decode items via parent algorithm class
+        (keyword arguments are passed on to the parent class)
         '''
-        super().__init__(psu_dict, order, decode_dict)
+        super().__init__(psu_dict, order, decode_dict, **kwargs)
         self.name = "First Choice Hill Climbing"
 
-    def run(self):
+    def run(self, state=None):
         '''
         method to run the algorithm from the constructed algorithm object
+            parameter: state - state from which to start, None is default, results in random start state
             returns: post precessed result - provided items, number of psus required, result state
         '''
         psu_dict = self.psu_dict
@@ -19,27 +21,38 @@ class First_Choice_Hill_Climbing(algorithm.Algorithm):
         decode_dict = self.decode_dict
 
         # get random initial state 
-        state = self.get_initial_state(psu_dict, order)
+        if state is None:
+            state = self.get_initial_state(psu_dict, order)
 
         # actual algorithm
         # in every iteration the first neighbor with lower cost than the current state is selected 
         # done if there is no neighbor with lower cost than current state
-        flag = True  
+        coverage_state = psu_coverage.Coverage_State(self.coverage, state)
+        stats = self.instrumentation
+        flag = not self.should_stop()
         while flag:
-            # get nieghbors of current state
-            neighbors = self.get_neighbors(state, psu_dict) 
-            current_cost = self.calculate_cost(state, psu_dict, order)
-            # get first neighbor with lower cost than current neighbor
-            updated = False  
-            for nb in neighbors:
-                nb_cost = self.calculate_cost(nb, psu_dict, order)
-                if nb_cost < current_cost:
-                    state = nb
-                    updated = True 
-                    break
+            current_cost = coverage_state.cost()
+            # get first move (slot i replaced by psu) with lower cost than current state, the rest of the neighborhood is never generated
+            moves = self.get_moves(coverage_state, psu_dict)
+            if stats is None:
+                move = next((move for move in moves if coverage_state.cost_if(*move) < current_cost), None)
+            else:
+                moves = stats.counted(moves, "neighbors generated", "cost evaluations")
+                with stats.phase("costing"):
+                    move = next((move for move in moves if coverage_state.cost_if(*move) < current_cost), None)
 
-            if not updated:
+            if move is None:
                 flag = False
+            else:
+                if stats is None:
+                    coverage_state.apply(*move)
+                else:
+                    with stats.phase("neighbor generation"):
+                        coverage_state.apply(*move)
+                    stats.count("accepted moves")
+                self.report(coverage_state.state, coverage_state.cost())
+                flag = not self.should_stop()
+        state = coverage_state.state
             
         # return postprocessed result
         return self.post_processing(state, decode_dict, psu_dict, order)
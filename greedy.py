@@ -0,0 +1,30 @@
+import algorithm, psu_coverage
+
+class Greedy(algorithm.Algorithm):
+    '''
+    Greedy set cover construction: repeatedly pick the PSU that provides the most order items not provided yet
+    '''
+
+    def __init__(self, psu_dict, order, decode_dict, **kwargs):
+        '''
+        initialize algorithm object with psu_dict, order list and dict to decode items via parent algorithm class
+        (keyword arguments are passed on to the parent class)
+        '''
+        super().__init__(psu_dict, order, decode_dict, **kwargs)
+        self.name = "Greedy Set Cover"
+
+    def run(self):
+        '''
+        method to run the algorithm from the constructed algorithm object
+            returns: post precessed result - provided items, number of psus required, result state
+        '''
+        psu_dict = self.psu_dict
+        order = self.order
+        decode_dict = self.decode_dict
+
+        with self.timed("initial state"):
+            state = psu_coverage.greedy_state(self.coverage, psu_dict, len(order))
+        self.report(state, self.calculate_cost(state, psu_dict, order))
+        # return postprocessed result
+        return self.post_processing(state, decode_dict, psu_dict, order)
+
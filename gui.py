@@ -1,8 +1,14 @@
 from tkinter import Tk, Frame, Label, Button, Entry, GROOVE, N,S, W, LEFT, StringVar, filedialog
-import file_parser, hill_climbing, first_choice_hill_climbing, simulated_annealing, random_restart_hill_climbing, local_beam_search, comparator
+import file_parser, hill_climbing, first_choice_hill_climbing, simulated_annealing, random_restart_hill_climbing, local_beam_search, greedy, comparator, preprocessing, problem_cache, warm_start
+import os
+import queue
+import threading
 import time
 import numpy as np
 
+# milliseconds between two updates of the progress of the current run
+POLL_INTERVAL = 100
+
 class Gui(object):
 
     def __init__(self, window):
@@ -15,7 +21,9 @@ class Gui(object):
                             2: "First-Choice Hill-Climbing",
                             3: "Simulated Annealing",
                             4: "Random Restart Hill-Climbing",
-                            5: "Local Beam search" }
+                            5: "Local Beam search",
+                            6: "Greedy Set Cover",
+                            8: "Warm Start" }
         # window config
         window.title("Warehouse Planner") 
         window.geometry('1400x400')
@@ -65,7 +73,22 @@ class Gui(object):
         Button(window, text=self.algorithms[3], command=lambda: self.choose_algorithm(3), width=25).grid(column=2, row=8)
         Button(window, text=self.algorithms[4], command=lambda: self.choose_algorithm(4), width=25).grid(column=2, row=9)
         Button(window, text=self.algorithms[5], command=lambda: self.choose_algorithm(5), width=25).grid(column=2, row=10)
-        Button(window, text="download comparison.csv", command=lambda: self.choose_algorithm(6), width=25).grid(column=2, row=12)
+        Button(window, text=self.algorithms[6], command=lambda: self.choose_algorithm(6), width=25).grid(column=2, row=11)
+        Button(window, text="download comparison.csv", command=lambda: self.choose_algorithm(7), width=25).grid(column=2, row=12)
+        Button(window, text="Cancel", command=self.cancel, width=25).grid(column=2, row=13)
+        # re-solve the current (amended) order starting from the last solution
+        Button(window, text="Re-solve from last result", command=lambda: self.choose_algorithm(8), width=25).grid(column=2, row=14)
+        self.solution = None # result state of the last finished run (PSU ids, valid for every order of the problem)
+
+        # runs are executed one after the other by a worker thread, the event loop polls their progress and results
+        self.progress = StringVar() # contains the progress of the current run
+        self.progress.set("")
+        Label(window, textvariable=self.progress).grid(column=4, row=3)
+        self.runs = queue.Queue() # runs waiting for the worker thread
+        self.messages = queue.Queue() # results posted by the worker thread
+        self.current = None # run executed by the worker thread
+        threading.Thread(target=self.work, daemon=True).start()
+        window.after(POLL_INTERVAL, self.poll)
         
 
     def load_problem(self):
@@ -80,15 +103,21 @@ class Gui(object):
         problem = filedialog.askopenfilename(filetypes=[("problemfiles", "*.txt")]) 
         # reset order, problem path and status
         self.order = None
+        self.solution = None
         self.order_file_name.set("Order FilePath")
         self.problem_file_name.set("Problem FilePath")
         self.status.set("")
-        # parse the problem file to create encoding, decoding and psu doctionaries
-        self.encode_dict, self.decode_dict, self.psu_dict = file_parser.read_problem(problem)   
-        if self.encode_dict is not None:
+        # parse the problem file (or load its compiled version from the cache) to create encoding, decoding and psu doctionaries
+        try:
+            self.encode_dict, self.decode_dict, self.psu_dict = problem_cache.read_problem(problem, raise_errors=True)
+            # inverted index (item - PSUs holding it), built once per problem and used to filter the PSUs of every order
+            self.item_index = preprocessing.build_item_index(self.psu_dict)
             self.problem_file_name.set("..." + problem[-19:]) # set label to filename
-        else:
-            self.status.set("Please select a problem file with the correct format and structure!")
+        except (OSError, UnicodeDecodeError, file_parser.ProblemFormatError) as error:
+            self.encode_dict, self.decode_dict, self.psu_dict = None, None, None
+            self.item_index = None
+            # show where the problem file is broken (line number for format errors)
+            self.status.set("Please select a problem file with the correct format and structure! ({})".format(error))
         # reset output labels to empty strings
         self.provided_items.set("")
         self.num_psus.set("")
@@ -115,7 +144,10 @@ class Gui(object):
                     # show items that are not in the inventory on the status label
                     self.status.set("Invalid order, solved by ignoring following items, which are not in the inventory: {}".format(self.missing_items))
                 else:
-                    self.status.set("")
+                    # show how much the search space shrank by the PSU reduction
+                    stats = self.reduction_stats
+                    self.status.set("relevant PSUs reduced from {} to {} ({} duplicates, {} dominated, {} forced)".format(
+                        stats["psus before"], stats["psus after"], stats["duplicates removed"], stats["dominated removed"], len(stats["forced psus"])))
                     self.missing_items = "None"
             else:
                 self.status.set("Please select an order file with the correct format and structure!")
@@ -129,71 +161,229 @@ class Gui(object):
 
     def choose_algorithm(self, name):
         '''
-        method for choosing and running the correct algorithm (depending on the button used to call the method)
-        it updates the output labels of the GUI with the result of the chosen algorithm
+        method for choosing the correct algorithm (depending on the button used to call the method)
+        the run is queued and executed by the worker thread, so the window stays responsive while it searches,
+        poll updates the output labels of the GUI with its progress and result
         '''
         try:
-            start = time.time() # for timing
-            n_states = ""
-            if name == 1:
-                # hill climbing
-                alg = hill_climbing.Hill_Climbing(self.filtered_psu_dict, self.order, self.decode_dict)
-                provided_items_str, num_psus, result_str = alg.run()
-            elif name == 2:
-                # first choice hill climbing
-                alg = first_choice_hill_climbing.First_Choice_Hill_Climbing(self.filtered_psu_dict, self.order, self.decode_dict)
-                provided_items_str, num_psus, result_str = alg.run()
-            elif name == 3:
-                # simulated annealing
-                alg = simulated_annealing.Simulated_Annealing(self.filtered_psu_dict, self.order, self.decode_dict)
-                provided_items_str, num_psus, result_str = alg.run()
-            elif name == 4:
-                # parallel hill climbing with n start states
-                alg = random_restart_hill_climbing.Random_Restart_Hill_Climbing(self.filtered_psu_dict, self.order, self.decode_dict, self.n_states_parallel.get())
-                provided_items_str, num_psus, result_str, n_states = alg.run()
-            elif name == 5:
-                # local beam search with n start states
-                alg = local_beam_search.Local_Beam_Search(self.filtered_psu_dict, self.order, self.decode_dict, self.n_states_beam.get())
-                provided_items_str, num_psus, result_str, n_states = alg.run()
-            elif name == 6:
-                comparison = comparator.Comparator(self.filtered_psu_dict, self.order, self.decode_dict)
-                comparison.compare_all()
-                path = filedialog.asksaveasfilename(defaultextension=".csv")
-                comparison.download(path)
-            
-            end = time.time() # for timing
-            # calculate duration of the algorithm execution
-            duration = "  [duration: {} sec.]".format(np.round(end-start, decimals=4))
-
-            # update labels with local search result
-            if name == 6:
-                self.status.set("done with Comparison - downloaded to: {}...{}".format(path[:30],path[-30:]))
-                self.provided_items.set("")
-                self.num_psus.set("")
-                self.result_dict.set("")
-            else:
-                self.status.set("done with {} {} - ignored items: {}".format(self.algorithms[name], n_states, self.missing_items))
-                self.provided_items.set(provided_items_str + duration)
-                self.num_psus.set(num_psus)
-                self.result_dict.set(result_str)
+            # the run keeps the current problem, order and inputs, so loading other files does not affect queued runs
+            psu_dict, order, decode_dict, missing_items = self.filtered_psu_dict, self.order, self.decode_dict, self.missing_items
+            if order is None:
+                raise AttributeError("no valid order")
         except AttributeError:
             self.status.set("Please select valid problem and order files first!")
+            return
+
+        path = None
+        if name == 1:
+            # hill climbing
+            alg_class, args, kwargs = hill_climbing.Hill_Climbing, (), {'vectorized': True}
+        elif name == 2:
+            # first choice hill climbing
+            alg_class, args, kwargs = first_choice_hill_climbing.First_Choice_Hill_Climbing, (), {}
+        elif name == 3:
+            # simulated annealing
+            alg_class, args, kwargs = simulated_annealing.Simulated_Annealing, (), {}
+        elif name == 4:
+            # parallel hill climbing with n start states
+            alg_class, args, kwargs = random_restart_hill_climbing.Random_Restart_Hill_Climbing, (self.n_states_parallel.get(),), {'vectorized': True}
+        elif name == 5:
+            # local beam search with n start states
+            alg_class, args, kwargs = local_beam_search.Local_Beam_Search, (self.n_states_beam.get(),), {'vectorized': True}
+        elif name == 6:
+            # greedy set cover construction
+            alg_class, args, kwargs = greedy.Greedy, (), {}
+        elif name == 8:
+            # warm start from the last result (e.g. after loading an amended order)
+            if self.solution is None:
+                self.status.set("Please run an algorithm first, its result is the start of the re-solve!")
+                return
+            alg_class, args, kwargs = warm_start.Warm_Start, (self.solution,), {}
+        elif name == 7:
+            # comparison of all algorithms, the file dialog has to be shown before the run (main thread only)
+            path = filedialog.asksaveasfilename(defaultextension=".csv")
+            if not path:
+                return
+            alg_class, args, kwargs = comparator.Comparator, (), {'workers': os.cpu_count() or 1}
+
+        run = Background_Run(self.algorithms.get(name, "Comparison"), alg_class, args, kwargs, psu_dict, order, decode_dict, missing_items, path)
+        self.runs.put(run)
+        if self.current is not None or self.runs.qsize() > 1:
+            self.status.set("queued {} ({} runs waiting)".format(run.label, self.runs.qsize()))
+
+    def work(self):
+        '''
+        worker thread: executes the queued runs one after the other and posts their results to self.messages
+        (tkinter is not thread safe, the labels are only updated by poll in the main thread)
+        '''
+        while True:
+            run = self.runs.get()
+            self.current = run
+            try:
+                self.messages.put(("done", run, run.execute()))
+            except Exception as error:
+                self.messages.put(("error", run, error))
+            self.current = None
+
+    def poll(self):
+        '''
+        called by the Tk event loop every POLL_INTERVAL milliseconds:
+        shows finished runs and the progress (iterations, best cost, elapsed time) of the current run
+        '''
+        try:
+            while True:
+                event, run, value = self.messages.get_nowait()
+                if event == "done":
+                    self.show_result(run, value)
+                else:
+                    self.status.set("{} failed: {}".format(run.label, value))
+        except queue.Empty:
+            pass
+
+        run = self.current
+        if run is None:
+            self.progress.set("")
+        else:
+            waiting = self.runs.qsize()
+            self.progress.set("running {}{}".format(run.get_progress(), " ({} queued)".format(waiting) if waiting else ""))
+        self.window.after(POLL_INTERVAL, self.poll)
+
+    def cancel(self):
+        '''
+        stop the current run, its best state found so far is shown as result (queued runs are still executed)
+        '''
+        run = self.current
+        if run is not None:
+            run.stop_event.set()
+
+    def show_result(self, run, result):
+        '''
+        update the output labels with the result of a finished run
+        parameters: run - Background_Run that finished
+                    result - (provided items, number of PSUs, result state, number of initial states) strings, None for the comparison
+        '''
+        # calculate duration of the algorithm execution
+        duration = "  [duration: {} sec.]".format(np.round(run.end-run.start, decimals=4))
+        done = "cancelled" if run.stop_event.is_set() else "done with"
+
+        # update labels with local search result
+        if result is None:
+            path = run.path
+            self.status.set("{} Comparison - downloaded to: {}...{}".format(done, path[:30],path[-30:]))
+            self.provided_items.set("")
+            self.num_psus.set("")
+            self.result_dict.set("")
+        else:
+            provided_items_str, num_psus, result_str, n_states = result
+            self.solution = run.result_state
+            self.status.set("{} {} {} (seed {}) - ignored items: {}".format(done, run.label, n_states, run.seed, run.missing_items))
+            self.provided_items.set(provided_items_str + duration)
+            self.num_psus.set(num_psus)
+            self.result_dict.set(result_str)
 
 
     def pre_processing(self, psu_dict, order):
         '''
         filters psu_dict for relevant psus (psus that contain at least one item from the order) and items (only items that are in the order)
+        and reduces them (duplicate and dominated PSUs are removed, see preprocessing.reduce_psus)
             parameters: psu_dict - complete dictionary of PSUs (key) and the numerically encoded items they hold (value)
                         order - list of numerically encoded order
             returns: filtered_psu_dict - only PSUs that contain at leat one relevant item for the order
         '''
-        # filter psu_dict by relevant psus (intersection between order and items in psu is > 0) and items (items that are in the order)
-        filtered_psu_dict = {key: list(set(val).intersection(set(order))) for key, val in psu_dict.items() if len(set(order).intersection(set(val))) > 0}
+        filtered_psu_dict = preprocessing.filter_psus(psu_dict, order, self.item_index)
+        filtered_psu_dict, self.reduction_stats = preprocessing.reduce_psus(filtered_psu_dict, order)
         filtered_psu_dict[0] = [] # add zero key as placeholder for no psu
 
         #return filtered psu_dic    
         return filtered_psu_dict
 
 
+class Background_Run(object):
+    '''
+    one run of an algorithm (or of the comparison) queued by the Gui and executed by its worker thread
+    the algorithm reports its progress through the callback hook and is stopped through the stop_event hook
+    '''
+
+    def __init__(self, label, alg_class, args, kwargs, psu_dict, order, decode_dict, missing_items, path=None):
+        '''
+        parameters: label - name of the algorithm shown in the GUI
+                    alg_class, args, kwargs - algorithm class, positional arguments after psu_dict/order/decode_dict and keyword arguments
+                    psu_dict, order, decode_dict - filtered problem and order of the run
+                    missing_items - ignored order items (shown with the result)
+                    path - path the comparison is downloaded to (only for the Comparator)
+        '''
+        self.label = label
+        self.alg_class = alg_class
+        self.args = args
+        self.kwargs = kwargs
+        self.psu_dict = psu_dict
+        self.order = order
+        self.decode_dict = decode_dict
+        self.missing_items = missing_items
+        self.path = path
+        self.stop_event = threading.Event()
+        self.seed = None  # seed of the algorithm, shown with the result to reproduce the run
+        self.result_state = None  # solution state of the run
+        # progress, written by the worker thread and read by the Gui
+        self.start = None
+        self.end = None
+        self.iterations = 0
+        self.best_cost = None
+        self.best_state = None
+        self.finished_runs = 0
+        self.num_runs = 0
+
+    def execute(self):
+        '''
+        run the algorithm (called in the worker thread)
+        returns: (provided items, number of PSUs, result state, number of initial states) strings of the result
+                 (best state reported so far if the run was cancelled and it is better), None for the comparison
+        '''
+        self.start = time.time()
+        try:
+            if self.path is not None:
+                comparison = self.alg_class(self.psu_dict, self.order, self.decode_dict, *self.args,
+                                            stop_event=self.stop_event, callback=self.comparison_callback, **self.kwargs)
+                comparison.compare_all()
+                comparison.download(self.path)
+                return None
+
+            alg = self.alg_class(self.psu_dict, self.order, self.decode_dict, *self.args,
+                                 stop_event=self.stop_event, callback=self.callback, **self.kwargs)
+            self.seed = alg.seed
+            result = alg.run()
+            n_states = result[3] if len(result) > 3 else ""
+            self.result_state = alg.result_state
+            if self.stop_event.is_set() and self.best_state is not None and \
+               self.best_cost < alg.calculate_cost(alg.result_state, self.psu_dict, self.order):
+                result = alg.post_processing(self.best_state, self.decode_dict, self.psu_dict, self.order)
+                self.result_state = self.best_state
+            return tuple(result[:3]) + (n_states,)
+        finally:
+            self.end = time.time()
 
+    def callback(self, state, cost):
+        '''
+        progress hook of the algorithms, called after every iteration of the search
+        '''
+        self.iterations += 1
+        if self.best_cost is None or cost < self.best_cost:
+            self.best_cost = cost
+            self.best_state = list(state)
 
+    def comparison_callback(self, finished, total):
+        '''
+        progress hook of the Comparator, called after every finished algorithm run
+        '''
+        self.finished_runs = finished
+        self.num_runs = total
+
+    def get_progress(self):
+        '''
+        returns: string summarizing the progress of the run
+        '''
+        elapsed = np.round(time.time() - self.start, decimals=1) if self.start is not None else 0.0
+        if self.path is not None:
+            return "Comparison: {}/{} runs, {} sec.".format(self.finished_runs, self.num_runs or "?", elapsed)
+        best = self.best_cost if self.best_cost is not None else "-"
+        return "{}: {} iterations, best cost {}, {} sec.".format(self.label, self.iterations, best, elapsed)
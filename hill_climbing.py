@@ -6,11 +6,12 @@ class Hill_Climbing(algorithm.Algorithm):
     Hill Climbing algorithm
     '''
     
-    def __init__(self, psu_dict, order, decode_dict):
+    def __init__(self, psu_dict, order, decode_dict, **kwargs):
         '''
         initialize algorithm object with psu_dict, order list and dict to decode items via parent algorithm class
+        (keyword arguments are passed on to the parent class)
         '''
-        super().__init__(psu_dict, order, decode_dict)
+        super().__init__(psu_dict, order, decode_dict, **kwargs)
         self.name = "Hill Climbing"
 
     def run(self, state=None):
@@ -28,18 +29,7 @@ class Hill_Climbing(algorithm.Algorithm):
             state = self.get_initial_state(psu_dict, order)
 
         # actual algorithm
-        # in every iteration get neighbors of current state and select neighbor with lowest cost
-        # done if there is no neighbor with lower cost than current state
-        flag = True
-        while flag:
-            # get neighbors of current state
-            neighbors = self.get_neighbors(state, psu_dict) 
-
-            # get lowest cost neighbor or False if there is no neighbor with lower cost than current state
-            result = self.get_min_cost_neighbor(neighbors, psu_dict, order, state) 
-            if not result:
-                flag = False
-            else:
-                state = result # update state with new state 
+        # in every iteration select neighbor with lowest cost, done if there is no neighbor with lower cost than current state
+        state = self.hill_climb(state, psu_dict)
         # return postprocessed result
         return self.post_processing(state, decode_dict, psu_dict, order)
\ No newline at end of file
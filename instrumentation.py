@@ -0,0 +1,124 @@
+from contextlib import contextmanager
+import csv
+import json
+import time
+
+# counters every Instrumentation starts with (algorithms may add their own, e.g. nodes of branch and bound)
+COUNTERS = ["cost evaluations", "neighbors generated", "accepted moves", "restarts"]
+# phases the run time of an algorithm is split into:
+#   initial state - construction of the initial state(s)
+#   neighbor generation - building states from moves (applying accepted moves, materializing selected neighbors)
+#   costing - scoring moves (neighborhood scans, single move costs)
+#   post processing - creating the result strings
+PHASES = ["initial state", "neighbor generation", "costing", "post processing"]
+# columns of the search trace
+TRACE_FIELDS = ["time [sec.]", "iteration", "cost", "best cost"]
+
+
+class Instrumentation(object):
+    '''
+    optional counters, phase timers and search trace of algorithm runs
+    passed to an algorithm as instrumentation keyword argument, without it the algorithms only check for None
+    (once per iteration, never per evaluated move), so there is no measurable overhead when it is disabled
+    '''
+
+    def __init__(self, trace=True):
+        '''
+        parameter: trace - if True the cost of every iteration is recorded (time, iteration, cost, best cost)
+        '''
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.trace_enabled = trace
+        self.trace = []
+        self.iterations = 0
+        self.best_cost = None
+        self.start = time.perf_counter()
+
+    def count(self, name, n=1):
+        '''
+        increase a counter
+        parameters: name - name of the counter (see COUNTERS)
+                    n - increment
+        '''
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, phase, seconds):
+        '''
+        add time to a phase
+        parameters: phase - name of the phase (see PHASES)
+                    seconds - time spent in the phase
+        '''
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        '''
+        context manager timing the enclosed block as phase name
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def counted(self, moves, *names):
+        '''
+        wrap a lazily generated neighborhood so that every move taken from it is counted
+        parameters: moves - iterable of moves
+                    names - names of the counters increased for every move
+        yields: the moves of moves
+        '''
+        counters = self.counters
+        for move in moves:
+            for name in names:
+                counters[name] += 1
+            yield move
+
+    def record(self, cost):
+        '''
+        record one iteration of the search (called by Algorithm.report)
+        parameter: cost - cost of the current state
+        '''
+        self.iterations += 1
+        if self.best_cost is None or cost < self.best_cost:
+            self.best_cost = cost
+        if self.trace_enabled:
+            self.trace.append((time.perf_counter() - self.start, self.iterations, cost, self.best_cost))
+
+    def merge(self, stats):
+        '''
+        add counters and phase times of another run (e.g. of a worker process)
+        parameter: stats - dict as returned by to_dict
+        '''
+        for name, n in stats["counters"].items():
+            self.count(name, n)
+        for phase, seconds in stats["phases [sec.]"].items():
+            self.add_time(phase, seconds)
+
+    def to_dict(self):
+        '''
+        returns: dict of counters, phase times, number of iterations, best cost and trace (list of dicts with TRACE_FIELDS keys)
+        '''
+        return {"counters": dict(self.counters),
+                "phases [sec.]": dict(self.phases),
+                "iterations": self.iterations,
+                "best cost": self.best_cost,
+                "trace": [dict(zip(TRACE_FIELDS, row)) for row in self.trace]}
+
+    def to_json(self, path):
+        '''
+        save counters, phase times and trace as .json file
+        parameter: path - path to which to save the file
+        '''
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def trace_to_csv(self, path):
+        '''
+        save the trace as .csv file (one row per iteration, e.g. to plot the convergence of the search)
+        parameter: path - path to which to save the file
+        '''
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(TRACE_FIELDS)
+            writer.writerows(self.trace)
@@ -1,17 +1,35 @@
-import algorithm
+import algorithm, psu_coverage
 import numpy as np
+import heapq
+import math
+import random
+import time
 
 class Local_Beam_Search(algorithm.Algorithm):
-    
-    def __init__(self, psu_dict, order, decode_dict, num_start_states):
+
+    def __init__(self, psu_dict, order, decode_dict, num_start_states, deduplicate=True, stochastic=False, temperature=1.0, **kwargs):
         '''
         initialize algorithm object with psu_dict, order list and dict to decode items via parent class
+        (other keyword arguments are passed on to the parent class)
+            deduplicate - if True, states with the same PSUs (permutations of each other, see psu_coverage.canonical_state)
+                          take only one beam slot as long as there are enough distinct candidates
+            stochastic - if True, stochastic beam search: the best candidate is always kept, the other beam states are
+                         sampled from the candidates with probability decreasing with their cost (see Beam_Selection)
+            temperature - temperature of the stochastic selection (weight exp(-(cost - best cost) / temperature))
         '''
-        super().__init__(psu_dict, order, decode_dict)
-        self.name = "Local Beam Search"
+        super().__init__(psu_dict, order, decode_dict, **kwargs)
+        self.deduplicate = deduplicate
+        self.stochastic = stochastic
+        self.temperature = temperature
+        self.name = "Stochastic Local Beam Search" if stochastic else "Local Beam Search"
+        # random 64 bit value per PSU (fixed, not drawn from the generator of the algorithm): the key of a state is the sum
+        # of the values of its PSUs, equal for all permutations and updated in O(1) for a single slot move
+        key_rng = random.Random(0)
+        self.psu_keys = {psu: key_rng.getrandbits(64) for psu in self.coverage.masks}
+        self.psu_keys[0] = 0
         # handle input of entry field for number of initial states: min 1, max 100
         self.default = False
-        try: 
+        try:
             self.num_start_states = int(num_start_states.replace(" ", ""))
             if self.num_start_states > 100:
                 self.num_start_states = 100
@@ -23,9 +41,10 @@ class Local_Beam_Search(algorithm.Algorithm):
             self.default = True
             self.num_start_states = 1
 
-    def run(self):
+    def run(self, state=None):
         '''
         method to run the algorithm from the constructed algorithm object
+            parameter: state - optional state used as first of the initial states (all others are random)
             returns: post precessed result - provided items, number of psus required, result state, number of initial states
         '''
         psu_dict = self.psu_dict
@@ -33,31 +52,55 @@ class Local_Beam_Search(algorithm.Algorithm):
         decode_dict = self.decode_dict
         num_start_states = self.num_start_states
 
-        # random initial states
-        states = [self.get_initial_state(psu_dict, order) for _ in range(num_start_states)]
+        # random initial states, every beam gets its own child seed
+        states = [self.get_initial_state(psu_dict, order, random.Random(seed)) for seed in self.get_child_seeds(num_start_states)]
+        if state is not None:
+            states[0] = list(state)
 
         # costs of initial states
         costs = [self.calculate_cost(state, psu_dict, order) for state in states]
         cost_sum = sum(costs)
         min_cost = min(costs)
 
-        flag = True
+        stats = self.instrumentation
+        flag = not self.should_stop()
         while flag:
-            # get neighbors of current states, that have lower cost than the lowest cost current state (only need better neighbors)
-            neighbors = [nb for state in states for nb in self.get_neighbors(state, psu_dict) if self.calculate_cost(nb, psu_dict, order) < min_cost]
+            if stats is not None:
+                start = time.perf_counter()
+            # stream the neighborhoods of the current states into the selection, every neighbor is scored once
+            # (incrementally) and only neighbors that have lower cost than the lowest cost current state are candidates
+            # (only need better neighbors), the selection retains at most num_start_states of them as moves
+            selection = Beam_Selection(num_start_states, self.deduplicate, self.rng if self.stochastic else None,
+                                       self.temperature, min_cost)
+            for c, state in enumerate(states):
+                coverage_state = psu_coverage.Coverage_State(self.coverage, state)
+                if stats is not None:
+                    num_moves = self.get_neighborhood_size(coverage_state, psu_dict)
+                    stats.count("neighbors generated", num_moves)
+                    stats.count("cost evaluations", num_moves)
+                self.select_moves(selection, c, coverage_state, min_cost)
+            # current states are candidates too (after all neighbors, so ties are won by neighbors)
+            for c, (state, cost) in enumerate(zip(states, costs)):
+                selection.push(cost, (len(states), c), self.get_state_key(state), state)
+            if stats is not None:
+                stats.add_time("costing", time.perf_counter() - start)
 
-            # get n lowest cost states from neighbors and current states
-            new_states = self.get_n_min_cost_states(states, neighbors, psu_dict, order, num_start_states) 
-            # calculate new costs
-            new_costs = [self.calculate_cost(state, psu_dict, order) for state in new_states]
+            # get n lowest cost (or sampled) states from neighbors and current states, only they are materialized
+            with self.timed("neighbor generation"):
+                new_states, new_costs = self.get_n_min_cost_states(states, selection)
 
             # if the cumulative cost of the new_states is lower than of the current states, then some improvement occured and we update
-            # else end the search
-            if sum(new_costs) < cost_sum:
+            # else end the search (stochastic: the best state is always kept, continue as long as it improves)
+            if (min(new_costs) < min_cost) if self.stochastic else (sum(new_costs) < cost_sum):
+                if stats is not None:
+                    # accepted moves: neighbors that replaced a state of the beam
+                    stats.count("accepted moves", sum(1 for new_state in new_states if not any(new_state is state for state in states)))
                 cost_sum = sum(new_costs)
                 min_cost = min(new_costs)
                 states = new_states
                 costs = new_costs
+                self.report(states[np.argmin(costs)], min_cost)
+                flag = not self.should_stop()
             else:
                 flag = False
 
@@ -73,29 +116,159 @@ class Local_Beam_Search(algorithm.Algorithm):
         num_states = "({}{} initial states)".format(default, num_start_states)
         return provided_items_str, num_psus, result_str, num_states
 
+    def get_state_key(self, state):
+        '''
+        permutation invariant 64 bit key of a state (sum of the random values of its PSUs), used for deduplication
+        parameter: state - list of PSU ids
+        returns: key - equal for states with the same PSUs (like psu_coverage.canonical_state, without sorting)
+        '''
+        psu_keys = self.psu_keys
+        return sum(psu_keys[psu] for psu in state) & 0xFFFFFFFFFFFFFFFF
 
-    def get_n_min_cost_states(self, states, neighbors, psu_dict, order, num_start_states):
+    def select_moves(self, selection, c, coverage_state, min_cost):
         '''
-        method to get the n (num_start_states) lowest cost states from neighbors and current states
-        parameters: states - current states 
-                    neighbors - neighbor states of current states in one list
-                    psu_dict - dictionary of items the psus carry
-                    order - list of items in the selected order
-                    num_start_states - defines number of inital states for local beam search
-        returns: n lowest cost states from neighbors and current states
+        push the neighbors of one beam state with lower cost than min_cost into the selection as moves
+        parameters: selection - Beam_Selection of the next beam
+                    c - index of the state in the beam
+                    coverage_state - psu_coverage.Coverage_State of the state
+                    min_cost - cost of the lowest cost state of the beam
+        '''
+        state = coverage_state.state
+        psu_keys = self.psu_keys
+        base_key = self.get_state_key(state)
+        if self.vectorized and self.neighborhood != "focused":
+            # score the whole neighborhood at once, flat indices are in (position, psu) order of iter_moves
+            nb_costs = coverage_state.neighborhood_costs().ravel()
+            candidates = np.flatnonzero(nb_costs < min_cost)
+            if not selection.stochastic:
+                # in order of cost (stable, ties in neighborhood order): once a neighbor is not retained, no later one is
+                candidates = candidates[np.argsort(nb_costs[candidates], kind="stable")]
+            psus = self.coverage.psus
+            num_psus = len(psus)
+            for index, cost in zip(candidates.tolist(), nb_costs[candidates].tolist()):
+                i, j = divmod(index, num_psus)
+                psu = psus[j]
+                key = (base_key - psu_keys[state[i]] + psu_keys[psu]) & 0xFFFFFFFFFFFFFFFF
+                if not selection.push(int(cost), (c, index), key, (c, i, psu)) and not selection.stochastic:
+                    break
+        else:
+            # the focused neighborhood contains every neighbor with lower cost than the state, in the same order
+            for index, (i, psu) in enumerate(self.get_moves(coverage_state, self.psu_dict)):
+                cost = coverage_state.cost_if(i, psu)
+                if cost < min_cost:
+                    key = (base_key - psu_keys[state[i]] + psu_keys[psu]) & 0xFFFFFFFFFFFFFFFF
+                    selection.push(cost, (c, index), key, (c, i, psu))
 
+    def get_n_min_cost_states(self, states, selection):
+        '''
+        method to get the n (num_start_states) selected states from neighbors and current states
+        parameters: states - current states
+                    selection - Beam_Selection the neighbors (as (state index, position, psu) moves) and current states
+                                were pushed into
+        returns: n lowest cost (or sampled) states from neighbors and current states and their costs
+                 (only the selected neighbors are materialized as states)
+        '''
+        new_states = []
+        new_costs = []
+        for cost, candidate in selection.get_selection():
+            if isinstance(candidate, tuple):
+                c, i, psu = candidate
+                candidate = self.apply_move(states[c], (i, psu))
+            new_states.append(candidate)
+            new_costs.append(cost)
+        return new_states, new_costs
+
+
+class Beam_Selection(object):
+    '''
+    streaming selection of the next beam: candidates are pushed one at a time (scored once) and only the k best are
+    retained in a bounded heap, so an iteration needs O(k) memory and O(log k) per retained candidate
+        - deterministic: the k lowest cost candidates, ties in the order the candidates were generated
+        - stochastic (rng given): k candidates sampled without replacement with weight exp(-(cost - best cost) / temperature)
+          (weighted reservoir sampling: random rank E / weight with E exponentially distributed, the k lowest ranks win),
+          the lowest cost candidate is always kept
+    with deduplication, candidates with the same key (same PSUs) take only one slot, duplicates only fill the beam
+    if there are less than k distinct candidates
+    '''
+
+    def __init__(self, k, deduplicate=True, rng=None, temperature=1.0, best_cost=0):
+        '''
+        parameters: k - number of states of the beam
+                    deduplicate - if True, candidates with equal keys are only retained once
+                    rng - random number generator (random.Random instance) of the stochastic selection, None: deterministic
+                    temperature - temperature of the stochastic selection
+                    best_cost - cost the weights of the stochastic selection are relative to (e.g. cost of the best beam state)
+        '''
+        self.k = k
+        self.deduplicate = deduplicate
+        self.rng = rng
+        self.stochastic = rng is not None
+        self.temperature = temperature
+        self.best_cost = best_cost
+        # max heaps of (negated rank, sequence number, key, cost, candidate): the worst retained candidate on top
+        self.heap = []
+        self.duplicates = []
+        self.keys = set()
+        self.count = 0
+        self.best = None  # (cost, order) and entry of the lowest cost candidate (stochastic selection only)
+
+    def get_rank(self, cost, order):
+        '''
+        returns: rank of a candidate (lower is better) - (cost, *order) or (random rank, *order) for the stochastic selection
+        '''
+        if not self.stochastic:
+            return (cost,) + order
+        weight_exponent = min((cost - self.best_cost) / self.temperature, 700.0)  # avoid overflow of exp
+        return (self.rng.expovariate(1.0) * math.exp(weight_exponent),) + order
+
+    def push(self, cost, order, key, candidate):
+        '''
+        offer a candidate to the selection
+        parameters: cost - cost of the candidate
+                    order - tuple giving the generation order of the candidate (ties are won by lower values)
+                    key - deduplication key of the candidate
+                    candidate - move or state (returned by get_selection if selected)
+        returns: False if the candidate ranks behind all retained candidates of a full selection, else True
+        '''
+        rank = self.get_rank(cost, order)
+        entry = (tuple(-r for r in rank), self.count, key, cost, candidate)
+        self.count += 1
+        if self.stochastic and (self.best is None or (cost, order) < self.best[0]):
+            self.best = ((cost, order), entry)
+        if self.deduplicate and key in self.keys:
+            # same PSUs as a retained candidate, only kept to fill the beam (bounded as well)
+            push_bounded(self.duplicates, entry, self.k)
+            return True
+        full = len(self.heap) >= self.k
+        if full and entry[0] <= self.heap[0][0]:
+            return False
+        if full:
+            self.keys.discard(heapq.heapreplace(self.heap, entry)[2])
+        else:
+            heapq.heappush(self.heap, entry)
+        self.keys.add(key)
+        return True
+
+    def get_selection(self):
+        '''
+        returns: list of the selected (cost, candidate) tuples (at most k, best rank first)
         '''
-        # concatenate current states with all neighbors
-        neighbors.extend(states)
-        
-        # calculate costs for every state, save in dict (state pos in neighbors: cost)
-        state_cost_dict = {c: self.calculate_cost(nb, psu_dict, order) for c,nb in enumerate(neighbors)}
+        entries = sorted(self.heap, reverse=True)
+        if self.best is not None and not any(entry is self.best[1] for entry in entries):
+            # the lowest cost candidate always survives the stochastic selection (replaces its duplicate or the worst entry)
+            same = [entry for entry in entries if entry[2] == self.best[1][2]]
+            entries.remove(same[0] if same else entries[-1])
+            entries.insert(0, self.best[1])
+        if len(entries) < self.k:
+            entries.extend(sorted(self.duplicates, reverse=True)[:self.k - len(entries)])
+        return [(cost, candidate) for _, _, _, cost, candidate in entries]
 
-        # create list of tuples with sorted items of dict (by cost)
-        states_sorted_by_costs = [(k, state_cost_dict[k]) for k in sorted(state_cost_dict, key=state_cost_dict.get)]
 
-        # get n lowest cost (state, cost) tuples
-        temp = states_sorted_by_costs[:num_start_states]
-        
-        # return the n states with lowest cost
-        return [neighbors[i[0]] for i in temp]
\ No newline at end of file
+def push_bounded(heap, entry, k):
+    '''
+    push an entry into a max heap of negated ranks that retains at most k entries
+    '''
+    if len(heap) < k:
+        heapq.heappush(heap, entry)
+    elif entry[0] > heap[0][0]:
+        heapq.heapreplace(heap, entry)
@@ -0,0 +1,86 @@
+'''
+benchmark of the streaming problem parser (file_parser.read_problem) against the previous readlines based parser
+on a synthetic problem file, every parser runs in its own process to measure its peak memory
+
+usage: python parser_benchmark.py [--psus 1000000] [--items 10000] [--file path/to/problem.txt]
+'''
+import file_parser, synthetic
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # not available on windows, peak memory is not reported there
+    resource = None
+
+
+def read_problem_readlines(path):
+    '''
+    previous parser (reads all lines at once, one python list per PSU), kept as baseline for the benchmark
+    '''
+    with open(path, "r") as file:
+        lines = file.readlines()
+    items = lines.pop(0).split(' ')[:-1]
+    encode_dict = {}
+    decode_dict = {}
+    for c, item in enumerate(items):
+        encode_dict[item] = c
+        decode_dict[c] = item
+    lines.pop(0)
+    psu_dict = {}
+    for c, l in enumerate(lines):
+        psu_dict[c] = [encode_dict[item] for item in l.split(' ') if not item in '\n']
+    return encode_dict, decode_dict, psu_dict
+
+
+# parsers that can be benchmarked: name - function returning something that holds the parsed problem
+PARSERS = {"readlines": read_problem_readlines,
+           "streaming (dicts)": file_parser.read_problem,
+           "streaming (arrays)": file_parser.parse_problem}
+
+
+def run_parser(name, path):
+    '''
+    parse the file with one parser in this process and print duration and peak memory
+    '''
+    start = time.perf_counter()
+    result = PARSERS[name](path)
+    duration = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource is not None else float("nan")
+    print("{:.3f} {:.1f}".format(duration, peak))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark problem file parsers on a synthetic problem.")
+    parser.add_argument("--psus", type=int, default=1000000, help="number of PSUs of the synthetic problem")
+    parser.add_argument("--items", type=int, default=10000, help="number of items in the inventory")
+    parser.add_argument("--file", help="use this problem file instead of generating one")
+    parser.add_argument("--run", help=argparse.SUPPRESS)  # internal: run a single parser in a child process
+    args = parser.parse_args(argv)
+
+    if args.run:
+        run_parser(args.run, args.file)
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file
+        if path is None:
+            path = os.path.join(tmp, "synthetic_problem.txt")
+            start = time.perf_counter()
+            synthetic.write_problem(path, *synthetic.generate_problem(args.psus, args.items, skew=0.0))
+            print("generated {} PSUs ({:.1f} MB) in {:.1f} sec.".format(args.psus, os.path.getsize(path) / 2**20, time.perf_counter() - start))
+        print("{:<20} {:>12} {:>16}".format("parser", "time [sec.]", "peak RSS [MB]"))
+        for name in PARSERS:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--run", name, "--file", path],
+                                    check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout.split()
+            print("{:<20} {:>12} {:>16}".format(name, output[0], output[1]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
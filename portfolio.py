@@ -0,0 +1,137 @@
+import algorithm, hill_climbing, simulated_annealing, local_beam_search
+import inspect
+import multiprocessing as mp
+import random
+import time
+import numpy as np
+
+class Portfolio(algorithm.Algorithm):
+    '''
+    Anytime portfolio solver: runs several local search strategies concurrently (one process each) under a hard
+    wall-clock budget, the strategies share the best state found so far (incumbent), which is returned at the deadline
+    '''
+
+    def __init__(self, psu_dict, order, decode_dict, time_budget=1.0, strategies=None, **kwargs):
+        '''
+        initialize algorithm object with psu_dict, order list and dict to decode items via parent class
+        (other keyword arguments are passed on to the parent class, e.g. seed: the strategy processes get child seeds of it)
+            time_budget - wall-clock budget in seconds, the incumbent is returned when it is used up
+            strategies - list of (algorithm class, positional arguments, keyword arguments) tuples run concurrently,
+                         default: hill climbing, simulated annealing and local beam search
+        '''
+        super().__init__(psu_dict, order, decode_dict, **kwargs)
+        self.name = "Portfolio"
+        self.time_budget = float(time_budget)
+        self.strategies = strategies if strategies is not None else self.get_default_strategies()
+
+    def get_default_strategies(self):
+        '''
+        returns: default strategies as list of (algorithm class, positional arguments, keyword arguments) tuples
+        '''
+        return [(hill_climbing.Hill_Climbing, (), {'vectorized': True}),
+                (simulated_annealing.Simulated_Annealing, (), {}),
+                (local_beam_search.Local_Beam_Search, ("10",), {'vectorized': True})]
+
+    def run(self):
+        '''
+        method to run the algorithm from the constructed algorithm object
+            returns: post precessed result - provided items, number of psus required, result state,
+                     time after which the returned state was found (and by which strategy)
+        '''
+        psu_dict = self.psu_dict
+        order = self.order
+        decode_dict = self.decode_dict
+
+        start = time.time()
+        deadline = start + self.time_budget
+        if self.deadline is not None:
+            deadline = min(deadline, self.deadline)
+
+        # shared incumbent: random initial state, so that there is an answer even if no strategy improves on it
+        state = self.get_initial_state(psu_dict, order)
+        incumbent = Incumbent(state, self.calculate_cost(state, psu_dict, order), start)
+
+        # one process per strategy, every process gets its own seed
+        seeds = self.get_child_seeds(len(self.strategies))
+        processes = [mp.Process(target=run_strategy, args=(strategy, c, psu_dict, order, decode_dict, self.coverage,
+                                                            deadline, incumbent, seeds[c]), daemon=True)
+                     for c, strategy in enumerate(self.strategies)]
+        for process in processes:
+            process.start()
+
+        # wait until all strategies stopped themselves at the deadline, terminate stragglers shortly after
+        for process in processes:
+            process.join(max(0, deadline - time.time()) + 0.5)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+        state, cost, found_after, strategy = incumbent.get()
+        provided_items_str, num_psus, result_str = self.post_processing(state, decode_dict, psu_dict, order)
+        found_by = self.strategies[strategy][0].__name__ if strategy >= 0 else "initial state"
+        found = "(found after {} of {} sec. by {})".format(np.round(found_after, decimals=4), self.time_budget, found_by)
+        return provided_items_str, num_psus, result_str, found
+
+
+class Incumbent(object):
+    '''
+    best state found so far, shared between processes via shared memory
+    '''
+
+    def __init__(self, state, cost, start):
+        '''
+        create shared memory for the incumbent state (fixed length), its cost, when and by which strategy it was found
+        '''
+        self.lock = mp.Lock()
+        self.state = mp.Array('q', state, lock=False)
+        self.cost = mp.Value('q', cost, lock=False)
+        self.found = mp.Value('d', 0.0, lock=False)
+        self.strategy = mp.Value('i', -1, lock=False)
+        self.start = start
+
+    def offer(self, state, cost, strategy):
+        '''
+        replace the incumbent if state has lower cost
+        returns: True if the incumbent was replaced
+        '''
+        # cheap check without lock first, offer is called once per search iteration
+        if cost >= self.cost.value:
+            return False
+        with self.lock:
+            if cost >= self.cost.value:
+                return False
+            self.state[:] = state
+            self.cost.value = cost
+            self.found.value = time.time() - self.start
+            self.strategy.value = strategy
+            return True
+
+    def get(self):
+        '''
+        returns: state, cost, seconds after start when it was found, index of the strategy that found it (-1: initial state)
+        '''
+        with self.lock:
+            return list(self.state), self.cost.value, self.found.value, self.strategy.value
+
+
+def run_strategy(strategy, c, psu_dict, order, decode_dict, coverage, deadline, incumbent, seed):
+    '''
+    run one strategy in a portfolio process until the deadline
+    every improvement is offered to the shared incumbent, once a run of the strategy ends before the deadline
+    a new run is started from the incumbent (strategies that cannot take a start state restart randomly)
+    '''
+    rng = random.Random(seed)  # perturbations of the incumbent, the algorithm gets a child seed
+    alg_class, args, kwargs = strategy
+    alg = alg_class(psu_dict, order, decode_dict, *args, coverage=coverage, deadline=deadline, seed=rng.getrandbits(32),
+                    callback=lambda state, cost: incumbent.offer(state, cost, c), **kwargs)
+    takes_state = 'state' in inspect.signature(alg.run).parameters
+    state = None  # first run starts from a random state
+    while time.time() < deadline:
+        if takes_state:
+            alg.run(state)
+        else:
+            alg.run()
+        state, _, _, _ = incumbent.get()
+        # a hill climber started from its own local optimum would stop immediately: perturb one position
+        state[rng.randrange(len(state))] = rng.choice(coverage.psus)
@@ -0,0 +1,103 @@
+import psu_coverage
+
+def build_item_index(psu_dict):
+    '''
+    inverted index of the warehouse: for every item the PSUs holding it, built once per problem file
+        parameters: psu_dict - complete dictionary of PSUs (key) and the numerically encoded items they hold (value)
+        returns: item_index - dictionary of numerically encoded items (key) and list of PSU ids holding it (value, in psu_dict order)
+    '''
+    item_index = {}
+    for psu, items in psu_dict.items():
+        for item in items:
+            item_index.setdefault(item, []).append(psu)
+    return item_index
+
+
+def filter_psus(psu_dict, order, item_index=None):
+    '''
+    filters psu_dict for relevant psus (psus that contain at least one item from the order) and items (only items that are in the order)
+        parameters: psu_dict - complete dictionary of PSUs (key) and the numerically encoded items they hold (value)
+                    order - list of numerically encoded order
+                    item_index - inverted index of psu_dict (see build_item_index), if given only the PSUs listed for the
+                                 order items are visited instead of the complete psu_dict
+        returns: filtered_psu_dict - only PSUs that contain at leat one relevant item for the order (without placeholder)
+    '''
+    order_set = set(order)
+    if item_index is None:
+        psus = psu_dict
+    else:
+        # relevant psus are the union of the postings of the order items
+        # (sorted: PSU ids are the row numbers of the problem file, i.e. the psu_dict order)
+        relevant_psus = set()
+        for item in order_set:
+            relevant_psus.update(item_index.get(item, ()))
+        psus = sorted(relevant_psus)
+    # filter psu_dict by relevant psus (intersection between order and items in psu is > 0) and items (items that are in the order)
+    filtered_psu_dict = {}
+    for key in psus:
+        relevant = order_set.intersection(psu_dict[key])
+        if relevant:
+            filtered_psu_dict[key] = list(relevant)
+    return filtered_psu_dict
+
+
+def reduce_psus(filtered_psu_dict, order):
+    '''
+    reduce the filtered PSUs without changing the optimal solutions:
+        - PSUs with identical relevant item sets are collapsed to one representative (the first one)
+        - PSUs whose relevant items are a strict subset of another PSU's items are dropped (dominated)
+        - PSUs that are the only holder of some order item are forced (they are part of every complete solution)
+    parameters: filtered_psu_dict - dictionary of relevant PSUs (key) and their order items (value), see filter_psus
+                order - list of numerically encoded order
+    returns: reduced_psu_dict - dictionary of the remaining PSUs (in the order of filtered_psu_dict)
+             stats - dict summarizing the reduction (number of PSUs before/after, duplicates, dominated,
+                     forced PSUs, neighborhood size before/after)
+    '''
+    coverage = psu_coverage.Coverage(filtered_psu_dict, order)
+    psus = [psu for psu in filtered_psu_dict if coverage.masks[psu]]
+    kept_psus, kept_masks = dominance_reduce(psus, coverage.masks)
+    kept = set(kept_psus)
+    reduced_psu_dict = {psu: items for psu, items in filtered_psu_dict.items() if psu in kept}
+
+    # forced PSUs: sole holder of an order item (among the kept PSUs)
+    holders = ([psu for psu in item_holders if psu in kept] for item_holders in coverage.holders)
+    forced = sorted(set(item_holders[0] for item_holders in holders if len(item_holders) == 1))
+
+    num_distinct = len(set(coverage.masks[psu] for psu in psus))
+    stats = {"psus before": len(filtered_psu_dict),
+             "psus after": len(reduced_psu_dict),
+             "duplicates removed": len(psus) - num_distinct,
+             "dominated removed": num_distinct - len(kept_psus),
+             "forced psus": forced,
+             # neighborhood size: every position of the state (one per order item) times every PSU (+ placeholder)
+             "neighborhood before": len(order) * (len(filtered_psu_dict) + 1),
+             "neighborhood after": len(order) * (len(reduced_psu_dict) + 1)}
+    return reduced_psu_dict, stats
+
+
+def dominance_reduce(psus, masks):
+    '''
+    dominance pruning for set cover: keep one PSU per distinct (non-empty) item mask and drop PSUs whose mask is a
+    strict subset of another PSU's mask (any solution using them stays valid with the dominating PSU instead)
+    parameters: psus - candidate PSU ids
+                masks - dict of psu id (key) and bitmask of order items (value)
+    returns: kept_psus, kept_masks - lists of kept PSU ids and their masks (largest masks first)
+    '''
+    representatives = {}
+    for psu in psus:
+        representatives.setdefault(masks[psu], psu)
+    # a mask can only be dominated by a larger one: check against the kept ones in order of size,
+    # only kept masks holding the mask's rarest item (among kept masks) can dominate it
+    kept = []
+    kept_by_item = {}
+    for mask in sorted(representatives, key=psu_coverage.popcount, reverse=True):
+        if not mask:
+            continue
+        positions = psu_coverage.bit_positions(mask)
+        rarest = min(positions, key=lambda pos: len(kept_by_item.get(pos, ())))
+        if any(mask & other == mask for other in kept_by_item.get(rarest, ())):
+            continue
+        kept.append(mask)
+        for pos in positions:
+            kept_by_item.setdefault(pos, []).append(mask)
+    return [representatives[mask] for mask in kept], kept
@@ -0,0 +1,229 @@
+import file_parser
+import hashlib
+import os
+import shutil
+import tempfile
+import numpy as np
+
+# default cache directory name, created next to the problem file
+CACHE_DIR_NAME = ".problem_cache"
+# version of the layout of the cache entries (part of the key, entries of older layouts are not read)
+CACHE_VERSION = 2
+# arrays of a cache entry, one .npy file each
+ARRAY_NAMES = ("vocabulary", "indptr", "indices", "item_indptr", "item_psus")
+
+
+def open_problem(path, cache_dir=None, raise_errors=False):
+    '''
+    open a problem file as compiled CSR arrays (see Problem): from the binary cache if it is still valid, memory-mapped,
+    otherwise the text file is parsed and the cache is (re)built
+        parameters: path - path of problem.txt file
+                    cache_dir - directory of the cache, default: .problem_cache next to the problem file
+                    raise_errors - if True, parsing errors are raised (see file_parser.read_problem)
+        returns: problem - Problem (None if the file is invalid)
+    '''
+    try:
+        problem = load(path, cache_dir)
+    except (OSError, ValueError):
+        problem = None
+    if problem is None:
+        try:
+            vocabulary, indptr, indices = file_parser.parse_problem(path)
+        except (OSError, UnicodeDecodeError, file_parser.ProblemFormatError):
+            if raise_errors:
+                raise
+            return None
+        problem = Problem(np.array(vocabulary, dtype=str), indptr, indices)
+        try:
+            save(path, problem.get_arrays(), cache_dir)
+            # reopen memory-mapped, so worker processes the problem is sent to share the pages of the entry
+            cached = load(path, cache_dir)
+            if cached is not None:
+                problem = cached
+        except (OSError, ValueError):
+            pass  # caching is optional, e.g. read-only directory
+    return problem
+
+
+def read_problem(path, cache_dir=None, raise_errors=False):
+    '''
+    read problem file like file_parser.read_problem, but from a compiled binary cache if it is still valid (see open_problem)
+    (the complete dictionaries are built, used by the GUI: batch mode, wave planning and the service work on the CSR arrays)
+        parameters: path - path of problem.txt file
+                    cache_dir - directory of the cache, default: .problem_cache next to the problem file
+                    raise_errors - if True, parsing errors are raised (see file_parser.read_problem)
+        returns: item encoding dict, item decoding dict, dict of PSUs and their items (None, None, None if the file is invalid)
+    '''
+    problem = open_problem(path, cache_dir, raise_errors)
+    if problem is None:
+        return None, None, None
+    return problem.to_dicts()
+
+
+class Problem(object):
+    '''
+    compiled problem in CSR layout: items of every PSU and (inverted index) PSUs holding every item as flat integer arrays,
+    memory-mapped if loaded from the cache (processes loading the same entry share its pages, a Problem loaded from the
+    cache is sent to worker processes as the path of its entry and mapped again there instead of being copied)
+    the PSUs of an order are filtered directly from the arrays, the complete psu_dict is never built
+    '''
+
+    def __init__(self, vocabulary, indptr, indices, item_indptr=None, item_psus=None, entry=None):
+        '''
+        parameters: vocabulary - item names (index is the numeric encoding)
+                    indptr, indices - items of PSU c are indices[indptr[c]:indptr[c+1]] (see file_parser.parse_problem)
+                    item_indptr, item_psus - PSUs holding item i are item_psus[item_indptr[i]:item_indptr[i+1]]
+                                             (in PSU order), built from indptr and indices if None
+                    entry - cache entry directory the arrays are memory-mapped from (None: arrays in memory)
+        '''
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.indices = indices
+        if item_indptr is None or item_psus is None:
+            item_indptr, item_psus = build_item_index(len(vocabulary), indptr, indices)
+        self.item_indptr = item_indptr
+        self.item_psus = item_psus
+        self.entry = entry
+        # item dictionaries are small (one entry per item of the inventory) and needed for every order
+        items = [str(item) for item in vocabulary]
+        self.encode_dict = {item: c for c, item in enumerate(items)}
+        self.decode_dict = dict(enumerate(items))
+
+    def __reduce__(self):
+        # memory-mapped problems are pickled as their cache entry (mapped again by the receiving process)
+        if self.entry is not None:
+            return load_entry, (self.entry,)
+        return Problem, (self.vocabulary, self.indptr, self.indices, self.item_indptr, self.item_psus)
+
+    def __len__(self):
+        '''
+        returns: number of PSUs
+        '''
+        return len(self.indptr) - 1
+
+    def __getitem__(self, psu):
+        '''
+        returns: list of the numerically encoded items of PSU psu (like psu_dict[psu])
+        '''
+        return self.indices[self.indptr[psu]:self.indptr[psu + 1]].tolist()
+
+    def get_arrays(self):
+        '''
+        returns: (vocabulary, indptr, indices, item_indptr, item_psus), the arrays stored in the cache
+        '''
+        return self.vocabulary, self.indptr, self.indices, self.item_indptr, self.item_psus
+
+    def get_holders(self, item):
+        '''
+        returns: list of the PSUs holding item (like preprocessing.build_item_index(psu_dict)[item])
+        '''
+        return self.item_psus[self.item_indptr[item]:self.item_indptr[item + 1]].tolist()
+
+    def filter_psus(self, order):
+        '''
+        relevant PSUs of an order, same result as preprocessing.filter_psus with the complete psu_dict and item index
+            parameter: order - list of numerically encoded order
+            returns: filtered_psu_dict - PSUs that contain at least one order item (key, in PSU order) and their order items
+        '''
+        order_set = set(order)
+        num_items = len(self.vocabulary)
+        postings = [self.item_psus[self.item_indptr[item]:self.item_indptr[item + 1]]
+                    for item in order_set if 0 <= item < num_items]
+        if not postings:
+            return {}
+        relevant_psus = np.unique(np.concatenate(postings))
+        # items of all relevant PSUs gathered at once (in row order), then split per PSU
+        starts = self.indptr[relevant_psus]
+        lengths = self.indptr[relevant_psus + 1] - starts
+        bounds = np.concatenate(([0], np.cumsum(lengths)))
+        flat = self.indices[np.repeat(starts - bounds[:-1], lengths) + np.arange(bounds[-1])].tolist()
+        bounds = bounds.tolist()
+        filtered_psu_dict = {}
+        for c, psu in enumerate(relevant_psus.tolist()):
+            filtered_psu_dict[psu] = list(order_set.intersection(flat[bounds[c]:bounds[c+1]]))
+        return filtered_psu_dict
+
+    def to_dicts(self):
+        '''
+        returns: item encoding dict, item decoding dict, dict of PSUs and their items (see file_parser.to_dicts)
+        '''
+        return file_parser.to_dicts(self.vocabulary, self.indptr, self.indices)
+
+
+def build_item_index(num_items, indptr, indices):
+    '''
+    inverted index in CSR layout (like preprocessing.build_item_index, as arrays)
+        parameters: num_items - number of items of the inventory
+                    indptr, indices - CSR layout of the PSU items
+        returns: item_indptr, item_psus - PSUs holding item i are item_psus[item_indptr[i]:item_indptr[i+1]] (in PSU order)
+    '''
+    psu_ids = np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+    # stable sort by item keeps the PSUs of every item in PSU order
+    item_psus = psu_ids[np.argsort(indices, kind="stable")]
+    item_indptr = np.zeros(num_items + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=num_items), out=item_indptr[1:])
+    return item_indptr, item_psus
+
+
+def cache_key(path):
+    '''
+    key of a problem file in the cache: hash of absolute path, size, modification time and layout version
+    (any change of the file results in a new key, old entries are never read again)
+    '''
+    stat = os.stat(path)
+    source = "{}|{}|{}|{}".format(os.path.abspath(path), stat.st_size, stat.st_mtime_ns, CACHE_VERSION)
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def get_entry_dir(path, cache_dir=None):
+    '''
+    directory of the cache entry of a problem file
+    '''
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    return os.path.join(cache_dir, cache_key(path))
+
+
+def load(path, cache_dir=None, mmap_mode="r"):
+    '''
+    load the compiled problem from the cache
+    parameters: path - path of problem.txt file (the cache entry is looked up by its key)
+                cache_dir - directory of the cache, default: .problem_cache next to the problem file
+                mmap_mode - passed to np.load, default "r": arrays are memory-mapped (shared between processes via the page cache)
+    returns: problem - Problem with the arrays of the entry or None if there is no valid cache entry
+    '''
+    if "problem" not in path or not os.path.isfile(path):
+        return None
+    entry = get_entry_dir(path, cache_dir)
+    if not os.path.isdir(entry):
+        return None
+    return load_entry(entry, mmap_mode)
+
+
+def load_entry(entry, mmap_mode="r"):
+    '''
+    load the arrays of a cache entry directory (see load)
+    returns: problem - Problem with the arrays of the entry
+    '''
+    arrays = [np.load(os.path.join(entry, name + ".npy"), mmap_mode=mmap_mode) for name in ARRAY_NAMES]
+    return Problem(*arrays, entry=entry if mmap_mode else None)
+
+
+def save(path, arrays, cache_dir=None):
+    '''
+    store the compiled problem in the cache (written to a temporary directory first and renamed, so readers never see partial entries)
+    parameters: path - path of problem.txt file
+                arrays - (vocabulary, indptr, indices, item_indptr, item_psus) see Problem.get_arrays
+                cache_dir - directory of the cache, default: .problem_cache next to the problem file
+    '''
+    entry = get_entry_dir(path, cache_dir)
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(entry))
+    try:
+        for name, array in zip(ARRAY_NAMES, arrays):
+            np.save(os.path.join(tmp, name + ".npy"), array)
+        os.replace(tmp, entry)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(entry):
+            raise
@@ -0,0 +1,430 @@
+import numpy as np
+import heapq
+from collections import OrderedDict
+
+class Coverage(object):
+    '''
+    compact representation of which order items every PSU covers
+    every PSU is encoded as an integer bitmask over the (distinct) order items, so that
+    the items provided by a state are a bitwise OR and the number of provided items a popcount
+    built once per (psu_dict, order) pair and shared by all algorithms working on that pair
+    '''
+
+    def __init__(self, psu_dict, order):
+        '''
+        build the bitmasks of all PSUs
+        parameters: psu_dict - dictionary of PSUs (key) and the numerically encoded items they hold (value)
+                    order - list of numerically encoded order
+        '''
+        # distinct order items (in order of appearance) and their bit position
+        self.items = list(dict.fromkeys(order))
+        self.positions = {item: pos for pos, item in enumerate(self.items)}
+        self.num_items = len(self.items)
+        self.full_mask = (1 << self.num_items) - 1
+
+        # psu id (key) - bitmask of the order items the PSU holds (value), items not in the order are ignored
+        self.masks = {psu: self.to_mask(items) for psu, items in psu_dict.items()}
+        self.masks.setdefault(0, 0)  # zero is the placeholder for no PSU
+        # candidate PSUs for moves in the order of psu_dict (the zero placeholder is only a candidate if it is in psu_dict)
+        self.psus = list(psu_dict)
+        self.has_placeholder = 0 in psu_dict
+        # psu id (key) - position in psu_dict (value), the zero placeholder last if it is not in psu_dict
+        self.psu_index = {psu: c for c, psu in enumerate(self.masks)}
+        self.matrix = None  # PSU x order item incidence matrix, built on first use by incidence_matrix
+        # psu id (key) - bit positions of the order items the PSU holds (value), used for incremental coverage counts
+        self.item_positions = {psu: bit_positions(mask) for psu, mask in self.masks.items()}
+        # inverted index restricted to the order: bit position of an order item (index) - PSUs holding it (value, in psu_dict order)
+        self.holders = [[] for _ in range(self.num_items)]
+        for psu, positions in self.item_positions.items():
+            for pos in positions:
+                self.holders[pos].append(psu)
+        # forced PSUs: sole holder of some order item, part of every state providing all order items (in psu_dict order),
+        # initial states, greedy covers, repairs and branch and bound start with them
+        forced = set(item_holders[0] for item_holders in self.holders if len(item_holders) == 1)
+        self.forced = [psu for psu in self.psus if psu in forced]
+
+    def incidence_matrix(self):
+        '''
+        get the PSU x order item incidence matrix used for vectorized neighborhood evaluation
+        returns: matrix - float array with one row per PSU (in the order of self.masks, i.e. psu_dict order with the
+                          zero placeholder last if it is not in psu_dict) and one column per order item,
+                          entry 1 if the PSU holds the item (float for fast exact matrix products of small counts)
+                 rows - dict of psu id (key) and row index in matrix (value)
+        '''
+        if self.matrix is None:
+            self.rows = self.psu_index
+            self.matrix = np.zeros((len(self.masks), self.num_items))
+            for psu, positions in self.item_positions.items():
+                self.matrix[self.rows[psu], positions] = 1
+        return self.matrix, self.rows
+
+    def to_mask(self, items):
+        '''
+        encode a list of numerically encoded items as bitmask over the order items
+        parameters: items - list of numerically encoded items
+        returns: mask - integer with bit i set if the i-th order item is in items
+        '''
+        mask = 0
+        for item in items:
+            pos = self.positions.get(item)
+            if pos is not None:
+                mask |= 1 << pos
+        return mask
+
+    def covered_mask(self, state):
+        '''
+        get bitmask of the order items provided by a state
+        parameters: state - list of PSU ids
+        returns: mask - bitwise OR of the masks of all PSUs in state
+        '''
+        masks = self.masks
+        mask = 0
+        for psu in state:
+            mask |= masks[psu]
+        return mask
+
+    def cost(self, state):
+        '''
+        calculate cost of a state: missing order items are counted 10 times compared to number of PSUs required
+        parameters: state - list of PSU ids
+        returns: cost - 10 * (number of missing order items) + number of non zero PSUs in state
+        '''
+        missing_items = self.num_items - popcount(self.covered_mask(state))
+        return missing_items*10 + len(state) - state.count(0)
+
+
+def canonical_state(state):
+    '''
+    canonical, hashable form of a state: the cost only depends on which PSUs are used (and how often), not on their positions
+    parameter: state - list of PSU ids
+    returns: sorted tuple of the non zero PSU ids (equal for all permutations of the state)
+    '''
+    return tuple(sorted(psu for psu in state if psu != 0))
+
+
+class Cost_Cache(object):
+    '''
+    bounded memoization (least recently used entries are dropped) of Coverage.cost keyed by canonical_state
+    permutations of the same PSUs are scored only once, share one object between algorithms/restarts to share the entries
+    '''
+
+    def __init__(self, coverage, maxsize=4096):
+        '''
+        parameters: coverage - Coverage object of psu_dict and order
+                    maxsize - maximum number of cached states
+        '''
+        self.coverage = coverage
+        self.maxsize = max(1, int(maxsize))
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def cost(self, state):
+        '''
+        cost of a state (same definition as Coverage.cost), looked up in the cache first
+        parameter: state - list of PSU ids
+        returns: cost of state
+        '''
+        key = canonical_state(state)
+        cost = self.entries.get(key)
+        if cost is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return cost
+        self.misses += 1
+        cost = self.coverage.cost(state)
+        self.entries[key] = cost
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return cost
+
+    def get_stats(self):
+        '''
+        returns: dict of hits, misses, hit rate, number of cached states and maximum size
+        '''
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self.entries), "maxsize": self.maxsize}
+
+
+def popcount(mask):
+    '''
+    number of set bits of a non-negative integer (int.bit_count is only available from python 3.10 on)
+    '''
+    return bin(mask).count("1")
+
+
+def bit_positions(mask):
+    '''
+    positions of the set bits of a non-negative integer in increasing order
+    (steps only over the set bits, so it stays cheap for long orders, e.g. the union of a wave of orders)
+    '''
+    positions = []
+    while mask:
+        low = mask & -mask
+        positions.append(low.bit_length() - 1)
+        mask ^= low
+    return positions
+
+
+def greedy_cover(coverage, psus, rng=None, covered=0):
+    '''
+    greedy set cover with a lazy priority queue: the gain of a PSU (number of uncovered order items it holds) can only
+    decrease, so stale gains in the queue are upper bounds and only the PSU on top has to be re-evaluated
+    parameters: coverage - psu_coverage.Coverage of psu_dict and order
+                psus - candidate PSU ids (e.g. the filtered psu_dict)
+                rng - optional random number generator (random module or random.Random) to break ties between PSUs
+                      with equal gain randomly, ties are broken by the order of psus if None
+                covered - bitmask of order items that are already provided (e.g. by the PSUs of a previous solution)
+    returns: chosen - list of chosen PSU ids (in order of selection)
+    '''
+    masks = coverage.masks
+    # heap entries: (-gain, tie breaker, psu id)
+    heap = [(-popcount(masks[psu]), rng.random() if rng is not None else c, psu)
+            for c, psu in enumerate(psus) if masks[psu]]
+    heapq.heapify(heap)
+
+    uncovered = coverage.full_mask & ~covered
+    chosen = []
+    while uncovered and heap:
+        _, tie, psu = heapq.heappop(heap)
+        gain = popcount(masks[psu] & uncovered)
+        if gain == 0:
+            continue
+        if not heap or gain >= -heap[0][0]:
+            # current gain is at least the upper bound of every other PSU
+            chosen.append(psu)
+            uncovered &= ~masks[psu]
+        else:
+            heapq.heappush(heap, (-gain, tie, psu))
+    return chosen
+
+
+def greedy_state(coverage, psus, length, rng=None):
+    '''
+    greedy set cover as state, starting with the forced PSUs of the coverage (their items are covered up front)
+    parameters: coverage, psus, rng - see greedy_cover
+                length - length of the state (number of items in order)
+    returns: state - forced and chosen PSUs padded with zeros (placeholder for no PSU) to the given length
+    '''
+    forced = coverage.forced
+    chosen = (forced + greedy_cover(coverage, psus, rng, covered=coverage.covered_mask(forced)))[:length]
+    return chosen + [0]*(length - len(chosen))
+
+
+class Coverage_State(object):
+    '''
+    coverage counts of one state: how many PSUs of the state cover every order item
+    answers the cost of changing a single slot of the state without re-evaluating the whole state
+    and is updated in place when such a move is accepted
+    '''
+
+    def __init__(self, coverage, state):
+        '''
+        count the coverage of all order items for the given state
+        parameters: coverage - Coverage object of psu_dict and order
+                    state - list of PSU ids (copied, the Coverage_State keeps its own state)
+        '''
+        self.coverage = coverage
+        self.state = list(state)
+        self.counts = [0] * coverage.num_items  # number of PSUs in state covering each order item
+        self.covered = 0  # bitmask of order items covered at least once
+        self.unique = 0  # bitmask of order items covered by exactly one PSU of the state
+        self.missing = coverage.num_items
+        self.num_psus = 0
+        for psu in self.state:
+            self.add_psu(psu)
+
+    def cost(self):
+        '''
+        returns: cost - cost of the current state (same definition as Coverage.cost)
+        '''
+        return self.missing*10 + self.num_psus
+
+    def cost_if(self, i, psu):
+        '''
+        cost of the state if slot i is replaced by psu (state itself is not changed)
+        parameters: i - position in state
+                    psu - PSU id that replaces the PSU at position i
+        returns: cost - cost of the neighbor state
+        '''
+        masks = self.coverage.masks
+        old_mask = masks[self.state[i]]
+        new_mask = masks[psu]
+        # items only covered by the old PSU are lost unless the new PSU holds them too,
+        # items the new PSU holds that are not covered yet are gained
+        lost = popcount(old_mask & self.unique & ~new_mask)
+        gained = popcount(new_mask & ~self.covered)
+        num_psus = self.num_psus - (self.state[i] != 0) + (psu != 0)
+        return (self.missing + lost - gained)*10 + num_psus
+
+    def missing_holders(self):
+        '''
+        PSUs that provide at least one order item the state does not cover yet (looked up in the inverted index
+        Coverage.holders), the only PSUs that can reduce the number of missing items when inserted
+        returns: psus - list of PSU ids without duplicates in psu_dict order (empty if the state covers all items)
+        '''
+        uncovered = self.coverage.full_mask & ~self.covered
+        holders = self.coverage.holders
+        psus = set()
+        for pos in bit_positions(uncovered):
+            psus.update(holders[pos])
+        return sorted(psus, key=self.coverage.psu_index.__getitem__)
+
+    def focused_moves(self):
+        '''
+        generate the focused neighborhood: the single slot moves that can lower the cost
+        (cost = 10 * missing items + number of PSUs, so a move is only an improvement if it provides a missing item
+        or removes a PSU without losing an item):
+            - insert a PSU holding an uncovered item into the first empty slot
+            - replace a PSU by one holding an uncovered item (this includes swaps for a PSU covering a superset)
+            - remove a redundant PSU (every item it holds is covered by another PSU of the state)
+        every improving move of the full neighborhood is in the focused one and the moves are generated in the same
+        order (slot by slot, PSUs in psu_dict order, placeholder last), so the first/best improving move is the same
+        (removals are only generated if the zero placeholder is a candidate, i.e. in psu_dict, like in the full neighborhood)
+        yields: (i, psu) - move that replaces the PSU at position i of the state by psu
+        '''
+        masks = self.coverage.masks
+        removable = self.coverage.has_placeholder
+        holders = self.missing_holders()  # the PSUs of the state cover no missing item, so old is never one of them
+        empty_slot = True
+        for i, old in enumerate(self.state):
+            if old == 0:
+                # all empty slots are equivalent, insertions are only generated for the first one
+                if not empty_slot:
+                    continue
+                empty_slot = False
+            for psu in holders:
+                yield i, psu
+            if old != 0 and removable and not masks[old] & self.unique:
+                yield i, 0
+
+    def min_cost_move_focused(self):
+        '''
+        scan the focused neighborhood (see focused_moves) without evaluating every move on its own:
+        the items a holder provides are the same for every slot, so for slots whose PSU holds no uniquely covered item
+        the best replacement is the holder providing the most uncovered items
+        returns: (i, psu, cost) - first move with the lowest cost or None if the focused neighborhood is empty
+        '''
+        masks = self.coverage.masks
+        removable = self.coverage.has_placeholder
+        uncovered = self.coverage.full_mask & ~self.covered
+        candidates = [(psu, masks[psu], popcount(masks[psu] & uncovered)) for psu in self.missing_holders()]
+        top = max(candidates, key=lambda candidate: candidate[2]) if candidates else None  # first holder with most gained items
+        best = None
+        empty_slot = True
+        for i, old in enumerate(self.state):
+            if old == 0:
+                if not empty_slot:
+                    continue
+                empty_slot = False
+            lost_mask = masks[old] & self.unique
+            base_missing = self.missing + popcount(lost_mask)
+            base_psus = self.num_psus - (old != 0)
+            if not lost_mask:
+                if top is not None:
+                    cost = (base_missing - top[2])*10 + base_psus + 1
+                    if best is None or cost < best[2]:
+                        best = (i, top[0], cost)
+                if old != 0 and removable:
+                    cost = base_missing*10 + base_psus
+                    if best is None or cost < best[2]:
+                        best = (i, 0, cost)
+            else:
+                for psu, mask, gained in candidates:
+                    # lost items covered by the new PSU are not lost
+                    cost = (base_missing - popcount(lost_mask & mask) - gained)*10 + base_psus + 1
+                    if best is None or cost < best[2]:
+                        best = (i, psu, cost)
+        return best
+
+    def min_cost_move(self, psus):
+        '''
+        scan all single slot moves (slot i becomes psu) in the order of Algorithm.get_neighbors
+        parameters: psus - iterable of candidate PSU ids (e.g. the filtered psu_dict)
+        returns: (i, psu, cost) - first move with the lowest cost
+        '''
+        masks = self.coverage.masks
+        candidates = [(psu, masks[psu], psu != 0) for psu in psus]
+        uncovered = self.coverage.full_mask & ~self.covered
+        best = None
+        for i, old in enumerate(self.state):
+            lost_mask = masks[old] & self.unique
+            base_missing = self.missing + popcount(lost_mask)
+            base_psus = self.num_psus - (old != 0)
+            for psu, mask, used in candidates:
+                # lost items covered by the new PSU are not lost, neither are they gained
+                cost = (base_missing - popcount(lost_mask & mask) - popcount(mask & uncovered))*10 + base_psus + used
+                if best is None or cost < best[2]:
+                    best = (i, psu, cost)
+        return best
+
+    def neighborhood_costs(self):
+        '''
+        costs of all single slot moves computed at once with array operations
+        returns: costs - integer array of shape (len(state), len(coverage.psus)), costs[i, j] is the cost of the state
+                         with position i replaced by coverage.psus[j] (identical to cost_if)
+        '''
+        matrix, rows = self.coverage.incidence_matrix()
+        state_rows = matrix[[rows[psu] for psu in self.state]]
+        # zero_without[i, u] = 1 if order item u is not covered anymore when the PSU at position i is removed
+        zero_without = (np.asarray(self.counts) - state_rows == 0).astype(float)
+        # missing items of a neighbor: items uncovered without position i that the new PSU does not hold
+        missing = zero_without.sum(axis=1)[:, None] - zero_without @ matrix[:len(self.coverage.psus)].T
+        num_psus = self.num_psus - (np.asarray(self.state) != 0)
+        used = np.asarray(self.coverage.psus) != 0
+        return np.rint(missing).astype(int)*10 + num_psus[:, None] + used[None, :]
+
+    def min_cost_move_vectorized(self):
+        '''
+        vectorized version of min_cost_move over the candidate PSUs coverage.psus
+        returns: (i, psu, cost) - first move with the lowest cost (same move as min_cost_move)
+        '''
+        costs = self.neighborhood_costs()
+        # argmin returns the first minimum in row major order, i.e. the same order as the scalar scan
+        i, j = np.unravel_index(np.argmin(costs), costs.shape)
+        return int(i), self.coverage.psus[j], int(costs[i, j])
+
+    def apply(self, i, psu):
+        '''
+        replace the PSU at position i of the state by psu and update the coverage counts in place
+        parameters: i - position in state
+                    psu - new PSU id at position i
+        '''
+        self.remove_psu(self.state[i])
+        self.state[i] = psu
+        self.add_psu(psu)
+
+    def add_psu(self, psu):
+        '''
+        count the items of psu (does not change self.state)
+        '''
+        if psu != 0:
+            self.num_psus += 1
+        counts = self.counts
+        for pos in self.coverage.item_positions[psu]:
+            counts[pos] += 1
+            bit = 1 << pos
+            if counts[pos] == 1:
+                self.covered |= bit
+                self.unique |= bit
+                self.missing -= 1
+            elif counts[pos] == 2:
+                self.unique &= ~bit
+
+    def remove_psu(self, psu):
+        '''
+        uncount the items of psu (does not change self.state)
+        '''
+        if psu != 0:
+            self.num_psus -= 1
+        counts = self.counts
+        for pos in self.coverage.item_positions[psu]:
+            counts[pos] -= 1
+            bit = 1 << pos
+            if counts[pos] == 0:
+                self.covered &= ~bit
+                self.unique &= ~bit
+                self.missing += 1
+            elif counts[pos] == 1:
+                self.unique |= bit
@@ -1,15 +1,22 @@
-import algorithm
+import algorithm, instrumentation
+from concurrent.futures import ProcessPoolExecutor
+import random
 
 class Random_Restart_Hill_Climbing(algorithm.Algorithm):
     '''
     Random restart hill climbing inherited from hill climbing - make use of method for getting least cost nieghbor
     '''
     
-    def __init__(self, psu_dict, order, decode_dict, num_start_states):
+    def __init__(self, psu_dict, order, decode_dict, num_start_states, workers=1, **kwargs):
         '''
         initialize algorithm object with psu_dict, order list and dict to decode items via parent class
+        (other keyword arguments are passed on to the parent class, e.g. seed: the restarts get child seeds of it,
+        so the result does not depend on the number of workers, cost_cache: opt-in, if given it is shared by all
+        restarts of the run, every worker process has its own cache of the same size)
+            workers - number of worker processes the restarts are distributed over (1: run sequentially in this process)
         '''
-        super().__init__(psu_dict, order, decode_dict)
+        super().__init__(psu_dict, order, decode_dict, **kwargs)
+        self.workers = max(1, int(workers))
         self.name = "Random Restart Hill Climbing"
         # handle input of entry field for number of initial states: min 1, max 100
         self.default = False
@@ -36,27 +43,32 @@ class Random_Restart_Hill_Climbing(algorithm.Algorithm):
         decode_dict = self.decode_dict
         num_start_states = self.num_start_states
 
-        results = []
-        for _ in range(num_start_states):
-            # get random initial state 
-            state = self.get_initial_state(psu_dict, order)
+        # every restart gets its own seed, derived in restart order from the generator of the algorithm
+        seeds = self.get_child_seeds(num_start_states)
 
-            # actual algorithm
-            # in every iteration get neighbors of current state and select neighbor with lowest cost
-            # done if there is no neighbor with lower cost than current state
-            flag = True
-            while flag:
-                # get nieghbors of current state
-                neighbors = self.get_neighbors(state, psu_dict) 
-
-                # get lowest cost neighbor or False if there is no neighbor with lower cost than current state
-                new_state = self.get_min_cost_neighbor(neighbors, psu_dict, order, state) 
-                if new_state == False:
-                    flag = False
-                else:
-                    state = new_state # update state with new state 
-            # safe result state for iteration
-            results.append(state)
+        if self.workers > 1 and num_start_states > 1:
+            # restarts are independent, farm them out to worker processes (results are returned in restart order)
+            workers = min(self.workers, num_start_states)
+            kwargs = {'coverage': self.coverage, 'vectorized': self.vectorized, 'initial_state': self.initial_state,
+                      'neighborhood': self.neighborhood, 'deadline': self.deadline}
+            if self.cost_cache is not None:
+                kwargs['cost_cache'] = self.cost_cache.maxsize
+            if self.instrumentation is not None:
+                # counters and phase times of the restarts are collected in the workers and merged here (no trace)
+                kwargs['instrumentation'] = instrumentation.Instrumentation(trace=False)
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(psu_dict, order, decode_dict, kwargs)) as executor:
+                results = list(executor.map(run_restart, seeds, chunksize=max(1, num_start_states // (4*workers))))
+            if self.instrumentation is not None:
+                for state, stats in results:
+                    self.instrumentation.merge(stats)
+                results = [state for state, stats in results]
+        else:
+            results = []
+            for seed in seeds:
+                # restarts that have not started when the search is stopped are skipped (at least one restart is run)
+                if results and self.should_stop():
+                    break
+                results.append(self.restart(seed))
 
         # get result from list with lowest cost
         min_cost_state = self.get_min_cost_neighbor(results, psu_dict, order, results[0])
@@ -71,3 +83,39 @@ class Random_Restart_Hill_Climbing(algorithm.Algorithm):
         num_states = "({}{} initial states)".format(default, num_start_states)
         return provided_items_str, num_psus, result_str, num_states
 
+    def restart(self, seed):
+        '''
+        run one hill climbing restart
+        parameters: seed - seed of the random initial state
+        returns: state - local optimum reached from the random initial state
+        '''
+        if self.instrumentation is not None:
+            self.instrumentation.count("restarts")
+        # get random initial state 
+        state = self.get_initial_state(self.psu_dict, self.order, random.Random(seed))
+
+        # actual algorithm
+        # in every iteration select neighbor with lowest cost, done if there is no neighbor with lower cost than current state
+        return self.hill_climb(state, self.psu_dict)
+
+
+# algorithm object of a worker process, created once per worker by init_worker
+worker_alg = None
+
+def init_worker(psu_dict, order, decode_dict, kwargs):
+    '''
+    initializer of the worker processes: psu_dict, order and coverage are sent once per worker instead of once per restart
+    '''
+    global worker_alg
+    worker_alg = Random_Restart_Hill_Climbing(psu_dict, order, decode_dict, "1", **kwargs)
+
+def run_restart(seed):
+    '''
+    run a single restart in a worker process
+    returns: state - local optimum of the restart, with the counters and phase times of the restart if instrumented
+    '''
+    if worker_alg.instrumentation is None:
+        return worker_alg.restart(seed)
+    # fresh counters for every restart, they are merged by the calling process
+    worker_alg.instrumentation = instrumentation.Instrumentation(trace=False)
+    return worker_alg.restart(seed), worker_alg.instrumentation.to_dict()
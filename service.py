@@ -0,0 +1,385 @@
+'''
+long-lived local solver service: the problems are parsed once and kept resident (with their inverted item indexes) in a
+pool of worker processes, solve requests are accepted over localhost HTTP (JSON) and micro-batched: while all workers are
+busy, incoming requests are queued and sent to the next free worker together (one inter-process round trip per batch)
+
+usage: python service.py --problem problem1=files/problem1.txt --port 8765 --workers 4
+endpoints:
+    POST /solve     {"problem": "problem1", "order": ["item-a", "item-b"], "algorithm": "hill-climbing", "time_budget": 1.0}
+                    (optional: "seed", "start_states", "neighborhood"), returns the PSUs of the solution
+    GET /stats      request, batch, throughput and latency counters
+    GET /problems   resident problems (number of items and PSUs)
+see service_client.py for a client and a load generator
+'''
+import problem_cache, psu_coverage, batch
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import queue
+import random
+import sys
+import threading
+import time
+import numpy as np
+
+# number of recent request latencies the percentiles of the stats are computed from
+LATENCY_WINDOW = 10000
+
+# problems of a worker process: name - problem_cache.Problem, set once per worker by init_worker
+worker_problems = None
+
+def init_worker(problems):
+    '''
+    initializer of the worker processes: the problems are sent once per worker (problems loaded from the cache as the paths
+    of their cache entries, memory-mapped by every worker, see problem_cache.Problem)
+    '''
+    global worker_problems
+    worker_problems = problems
+
+
+def solve_batch(requests):
+    '''
+    solve a micro-batch of requests in a worker process, one after the other
+    parameter: requests - list of request dicts (see solve_request)
+    returns: list of result dicts in the order of requests
+    '''
+    return [solve_request(request) for request in requests]
+
+
+def solve_request(request):
+    '''
+    solve one request with the resident problem of this process
+    parameter: request - dict with problem, order (item names), algorithm, time_budget, start_states, neighborhood and seed
+    returns: result - dict with the PSUs of the solution (or an error message)
+    '''
+    start = time.perf_counter()
+    problem = worker_problems[request["problem"]]
+    encode_dict = problem.encode_dict
+    order = list(dict.fromkeys(encode_dict[item] for item in request["order"] if item in encode_dict))
+    ignored = [item for item in request["order"] if item not in encode_dict]
+    result = {"seed": request["seed"], "order items": len(order), "ignored items": ignored}
+    if not order:
+        result.update({"provided items": 0, "number of PSUs": 0, "PSUs": [], "solve time [sec.]": 0.0})
+        return result
+
+    # the time budget starts when the worker picks the request up (requests of a batch are solved one after the other)
+    options = {"start_states": request["start_states"], "time_budget": request["time_budget"],
+               "neighborhood": request["neighborhood"], "deadline": time.time() + request["time_budget"]}
+    try:
+        alg, _ = batch.solve(problem, order, request["algorithm"], options, request["seed"])
+    except Exception as error:
+        result["error"] = "{}: {}".format(type(error).__name__, error)
+        return result
+    psus = [int(psu) for psu in alg.result_state if psu != 0]
+    result.update({"provided items": psu_coverage.popcount(alg.coverage.covered_mask(psus)),
+                   "number of PSUs": len(psus),
+                   "PSUs": psus,
+                   "solve time [sec.]": round(time.perf_counter() - start, 6)})
+    return result
+
+
+class Pending_Request(object):
+    '''
+    request waiting in the service: set by the dispatcher once its batch is solved
+    '''
+
+    def __init__(self, request):
+        self.request = request
+        self.received = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+
+
+class Solver_Service(object):
+    '''
+    resident problems, worker pool and micro-batching dispatcher behind the HTTP server (usable without it)
+    '''
+
+    def __init__(self, problems, workers=1, batch_size=16, batch_window=0.002, algorithm="hill-climbing", time_budget=1.0, seed=None):
+        '''
+        start the worker pool and the dispatcher
+        parameters: problems - dict of problem name and problem_cache.Problem
+                    workers - number of worker processes
+                    batch_size - maximum number of requests sent to a worker at once
+                    batch_window - seconds the dispatcher waits for more requests once a worker is free
+                    algorithm, time_budget - defaults of requests that do not specify them
+                    seed - seed from which the seeds of requests without seed are drawn
+        '''
+        self.problems = {name: {"items": len(problem.vocabulary), "psus": len(problem)} for name, problem in problems.items()}
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self.batch_window = batch_window
+        self.algorithm = algorithm
+        self.time_budget = time_budget
+        self.rng = random.Random(seed)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker, initargs=(problems,))
+        # start the workers (and send them the problems) now, not with the first requests
+        for future in [self.executor.submit(solve_batch, []) for _ in range(self.workers)]:
+            future.result()
+
+        # counters (updated under self.lock)
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.counters = {"requests": 0, "completed": 0, "errors": 0, "batches": 0, "batched requests": 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        # (arrival, completion) times of the last LATENCY_WINDOW finished requests, for the throughput
+        self.finished = deque(maxlen=LATENCY_WINDOW)
+
+        # one batch per free worker: while all workers are busy, requests queue up and form the next batch
+        self.pending = queue.Queue()
+        self.free_workers = threading.Semaphore(self.workers)
+        self.closed = False
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def get_request(self, request):
+        '''
+        validate a request and fill in the defaults
+        parameter: request - dict decoded from the JSON body of a solve request
+        returns: request dict as used by solve_request
+        raises: ValueError if the request is invalid
+        '''
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+        if not isinstance(request.get("problem"), str) or request["problem"] not in self.problems:
+            raise ValueError("unknown problem {!r}, resident problems: {}".format(request.get("problem"), ", ".join(sorted(self.problems))))
+        order = request.get("order")
+        if not isinstance(order, list) or not all(isinstance(item, str) for item in order):
+            raise ValueError("order must be a list of item names")
+        algorithm = request.get("algorithm", self.algorithm)
+        if algorithm not in batch.ALGORITHMS:
+            raise ValueError("unknown algorithm {!r}, algorithms: {}".format(algorithm, ", ".join(sorted(batch.ALGORITHMS))))
+        neighborhood = request.get("neighborhood", "focused")
+        if neighborhood not in ("full", "focused"):
+            raise ValueError('neighborhood must be "full" or "focused"')
+        try:
+            time_budget = float(request.get("time_budget", self.time_budget))
+            start_states = int(request.get("start_states", 10))
+            seed = int(request["seed"]) if request.get("seed") is not None else None
+        except (TypeError, ValueError):
+            raise ValueError("time_budget, start_states and seed must be numbers") from None
+        if seed is None:
+            with self.lock:
+                seed = self.rng.getrandbits(32)
+        return {"problem": request["problem"], "order": order, "algorithm": algorithm, "time_budget": time_budget,
+                "start_states": start_states, "neighborhood": neighborhood, "seed": seed}
+
+    def submit(self, request):
+        '''
+        queue a solve request
+        parameter: request - dict of the solve request (see get_request)
+        returns: Pending_Request, its done event is set when the result is available
+        raises: ValueError if the request is invalid
+        '''
+        pending = Pending_Request(self.get_request(request))
+        with self.lock:
+            self.counters["requests"] += 1
+        self.pending.put(pending)
+        return pending
+
+    def solve(self, request):
+        '''
+        solve a request (blocks until it is solved)
+        parameter: request - dict of the solve request (see get_request)
+        returns: result dict (see solve_request) with latency and batch size
+        '''
+        pending = self.submit(request)
+        pending.done.wait()
+        return pending.result
+
+    def dispatch(self):
+        '''
+        dispatcher thread: waits for a free worker, collects the queued requests (at most batch_size, waiting at most
+        batch_window for more) and sends them to the worker as one batch
+        '''
+        while not self.closed:
+            self.free_workers.acquire()
+            requests = [self.pending.get()]
+            if requests[0] is None:
+                break
+            end = time.perf_counter() + self.batch_window
+            while len(requests) < self.batch_size:
+                try:
+                    pending = self.pending.get(timeout=max(0.0, end - time.perf_counter())) if self.batch_window else self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if pending is None:
+                    self.closed = True
+                    break
+                requests.append(pending)
+            future = self.executor.submit(solve_batch, [pending.request for pending in requests])
+            future.add_done_callback(lambda future, requests=requests: self.finish(requests, future))
+
+    def finish(self, requests, future):
+        '''
+        called when a batch is solved: hands the results to the waiting requests and updates the counters
+        '''
+        self.free_workers.release()
+        try:
+            results = future.result()
+        except Exception as error:
+            results = [{"error": "{}: {}".format(type(error).__name__, error)} for _ in requests]
+        now = time.perf_counter()
+        with self.lock:
+            self.counters["batches"] += 1
+            self.counters["batched requests"] += len(requests)
+            for pending, result in zip(requests, results):
+                latency = now - pending.received
+                result.update({"problem": pending.request["problem"], "algorithm": pending.request["algorithm"],
+                               "latency [sec.]": round(latency, 6), "batch size": len(requests)})
+                self.counters["errors" if "error" in result else "completed"] += 1
+                self.latencies.append(latency)
+                self.finished.append((pending.received, now))
+        for pending, result in zip(requests, results):
+            pending.result = result
+            pending.done.set()
+
+    def get_stats(self):
+        '''
+        returns: dict of request counters, batches, throughput and latency percentiles (of the last LATENCY_WINDOW requests)
+                 throughput: finished requests per second from the arrival of the first to the completion of the last of
+                 these requests (startup and idle time before them are not counted)
+        '''
+        with self.lock:
+            counters = dict(self.counters)
+            latencies = np.array(self.latencies)
+            finished = list(self.finished)
+        uptime = time.perf_counter() - self.start
+        busy = max(completion for _, completion in finished) - min(arrival for arrival, _ in finished) if finished else 0.0
+        stats = {"uptime [sec.]": round(uptime, 3),
+                 "workers": self.workers,
+                 "requests": counters["requests"],
+                 "completed": counters["completed"],
+                 "errors": counters["errors"],
+                 "in progress": counters["requests"] - counters["completed"] - counters["errors"],
+                 "queued": self.pending.qsize(),
+                 "batches": counters["batches"],
+                 "mean batch size": round(counters["batched requests"] / counters["batches"], 3) if counters["batches"] else 0.0,
+                 "throughput [req./sec.]": round(len(finished) / busy, 3) if busy > 0 else 0.0}
+        if len(latencies):
+            stats["latency [sec.]"] = {"mean": round(float(latencies.mean()), 6),
+                                       "p50": round(float(np.percentile(latencies, 50)), 6),
+                                       "p95": round(float(np.percentile(latencies, 95)), 6),
+                                       "p99": round(float(np.percentile(latencies, 99)), 6),
+                                       "max": round(float(latencies.max()), 6)}
+        return stats
+
+    def close(self):
+        '''
+        stop the dispatcher and the worker pool (queued requests are not solved)
+        '''
+        self.closed = True
+        self.pending.put(None)
+        self.free_workers.release()
+        self.dispatcher.join()
+        self.executor.shutdown(wait=True)
+
+
+class Request_Handler(BaseHTTPRequestHandler):
+    '''
+    HTTP handler of the service (one thread per connection, connections are kept alive)
+    '''
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, without this every response waits for the delayed ACK of the client
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == "/stats":
+            self.send_json(200, service.get_stats())
+        elif self.path == "/problems":
+            self.send_json(200, service.problems)
+        else:
+            self.send_json(404, {"error": "unknown path {}".format(self.path)})
+
+    def do_POST(self):
+        if self.path != "/solve":
+            self.send_json(404, {"error": "unknown path {}".format(self.path)})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length).decode("utf-8"))
+            result = self.server.service.solve(request)
+        except ValueError as error:  # also invalid JSON (json.JSONDecodeError is a ValueError)
+            self.send_json(400, {"error": str(error)})
+            return
+        self.send_json(500 if "error" in result else 200, result)
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # no log line per request (high request rates), see /stats
+        pass
+
+
+class Solver_Server(ThreadingHTTPServer):
+    '''
+    HTTP server of the service: one thread per connection, a longer listen queue than the default of 5
+    (connection attempts beyond the queue are retried by the client only after a second)
+    '''
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def create_server(service, host="127.0.0.1", port=8765):
+    '''
+    HTTP server of a Solver_Service (call serve_forever to handle requests)
+    parameters: service - Solver_Service
+                host, port - address to listen on (port 0: any free port, see server.server_address)
+    returns: server - Solver_Server with the service as attribute
+    '''
+    server = Solver_Server((host, port), Request_Handler)
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    '''
+    command line entry point, returns the exit code
+    '''
+    parser = argparse.ArgumentParser(description="Local solver service with resident problems (localhost HTTP).")
+    parser.add_argument("--problem", action="append", required=True, metavar="NAME=PATH",
+                        help="problem to keep resident, e.g. problem1=files/problem1.txt (can be repeated)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--batch-size", type=int, default=16, help="maximum number of requests per micro-batch")
+    parser.add_argument("--batch-window", type=float, default=2.0, help="milliseconds to wait for more requests of a micro-batch")
+    parser.add_argument("--algorithm", choices=sorted(batch.ALGORITHMS), default="hill-climbing", help="default algorithm of requests")
+    parser.add_argument("--time-budget", type=float, default=1.0, help="default time budget of requests in seconds")
+    parser.add_argument("--cache-dir", help="directory of the compiled problem cache (default: .problem_cache next to the problem file)")
+    parser.add_argument("--seed", type=int, help="seed of the request seeds")
+    args = parser.parse_args(argv)
+
+    problems = {}
+    for problem in args.problem:
+        name, _, path = problem.partition("=")
+        if not path:
+            name, path = name.rsplit("/", 1)[-1].rsplit(".", 1)[0], name  # only a path given: name of the file
+        problems[name] = problem_cache.open_problem(path, args.cache_dir)
+        if problems[name] is None:
+            parser.error("could not read problem file {}".format(path))
+
+    service = Solver_Service(problems, args.workers, args.batch_size, args.batch_window / 1000, args.algorithm, args.time_budget, args.seed)
+    server = create_server(service, args.host, args.port)
+    print("serving {} on http://{}:{}".format(", ".join(problems), *server.server_address), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+'''
+client of the local solver service (service.py) and load generator measuring its latency and throughput on one machine
+
+usage: python service.py --problem problem1=files/problem1.txt --workers 4 &
+       python service_client.py --problem problem1 --problem-file files/problem1.txt --requests 1000 --concurrency 16
+'''
+import batch
+from http.client import HTTPConnection
+from urllib.parse import urlsplit
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import numpy as np
+
+
+class Service_Error(Exception):
+    '''
+    error returned by the service (invalid request or failed solve), knows the HTTP status
+    '''
+
+    def __init__(self, status, message):
+        self.status = status
+        super().__init__("{}: {}".format(status, message))
+
+
+class Solver_Client(object):
+    '''
+    client of the service, keeps one connection open (not thread safe: use one client per thread)
+    '''
+
+    def __init__(self, url="http://127.0.0.1:8765", timeout=60.0):
+        '''
+        parameters: url - address of the service
+                    timeout - seconds to wait for a response
+        '''
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 8765
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method, path, body=None):
+        '''
+        send a request (reconnects once if the kept connection was closed)
+        returns: decoded JSON response
+        raises: Service_Error if the service answers with an error status
+        '''
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request(method, path, data, headers)
+                response = self.connection.getresponse()
+                result = json.loads(response.read().decode("utf-8"))
+                break
+            except (ConnectionError, OSError):
+                self.close()
+                if attempt:
+                    raise
+        if response.status != 200:
+            raise Service_Error(response.status, result.get("error", result))
+        return result
+
+    def solve(self, problem, order, algorithm=None, time_budget=None, seed=None, **options):
+        '''
+        solve an order with a resident problem of the service
+        parameters: problem - name of the problem
+                    order - list of item names
+                    algorithm, time_budget, seed - optional, defaults of the service if None
+                    options - other request fields (start_states, neighborhood)
+        returns: result dict (PSUs, number of PSUs, provided items, latency, ...)
+        '''
+        body = {"problem": problem, "order": list(order)}
+        for name, value in (("algorithm", algorithm), ("time_budget", time_budget), ("seed", seed)):
+            if value is not None:
+                body[name] = value
+        body.update(options)
+        return self.request("POST", "/solve", body)
+
+    def get_stats(self):
+        '''
+        returns: counters of the service (see service.Solver_Service.get_stats)
+        '''
+        return self.request("GET", "/stats")
+
+    def get_problems(self):
+        '''
+        returns: resident problems of the service
+        '''
+        return self.request("GET", "/problems")
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def read_inventory(path):
+    '''
+    item names of a problem file (first line), to generate random orders
+    '''
+    with open(path, "r") as file:
+        return file.readline().split()
+
+
+def read_orders(pattern):
+    '''
+    orders of order files as lists of item names
+    parameter: pattern - directory or glob pattern of order files (see batch.find_orders)
+    '''
+    orders = []
+    for path in batch.find_orders(pattern):
+        with open(path, "r") as file:
+            orders.append(file.readline().split())
+    return orders
+
+
+def run_load(url, problem, orders, num_requests, concurrency, algorithm=None, time_budget=None, seed=0):
+    '''
+    send num_requests solve requests with concurrency concurrent clients
+    parameters: url - address of the service
+                problem - name of the resident problem
+                orders - list of orders (item names), request c sends order c modulo the number of orders
+                num_requests - total number of requests
+                concurrency - number of client threads
+                algorithm, time_budget - request fields (None: defaults of the service)
+                seed - seed of request c is seed + c (reproducible solutions)
+    returns: dict of duration, throughput, errors and client side latency percentiles
+    '''
+    latencies = []
+    errors = []
+    next_request = iter(range(num_requests))
+    lock = threading.Lock()
+
+    def work():
+        client = Solver_Client(url)
+        while True:
+            with lock:
+                c = next(next_request, None)
+            if c is None:
+                break
+            start = time.perf_counter()
+            try:
+                client.solve(problem, orders[c % len(orders)], algorithm, time_budget, seed + c)
+            except (Service_Error, OSError) as error:
+                with lock:
+                    errors.append(str(error))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+        client.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=work) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    report = {"requests": num_requests, "concurrency": concurrency, "errors": len(errors),
+              "duration [sec.]": round(duration, 3), "throughput [req./sec.]": round(len(latencies) / duration, 3)}
+    if latencies:
+        latencies = np.array(latencies)
+        report["latency [ms]"] = {name: round(float(np.percentile(latencies, q)) * 1000, 3)
+                                  for name, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))}
+    if errors:
+        report["first error"] = errors[0]
+    return report
+
+
+def main(argv=None):
+    '''
+    load generator entry point, returns the exit code (1 if requests failed)
+    '''
+    parser = argparse.ArgumentParser(description="Load generator for the local solver service.")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--problem", required=True, help="name of the resident problem")
+    parser.add_argument("--orders", help='order files to send (directory or glob pattern, e.g. "files/order*.txt")')
+    parser.add_argument("--problem-file", help="problem file to sample random orders from (instead of --orders)")
+    parser.add_argument("--order-length", type=int, default=10, help="number of items of the random orders")
+    parser.add_argument("--num-orders", type=int, default=100, help="number of distinct random orders")
+    parser.add_argument("--requests", type=int, default=200, help="total number of requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="number of concurrent clients")
+    parser.add_argument("--algorithm", choices=sorted(batch.ALGORITHMS), help="algorithm of the requests (default: service default)")
+    parser.add_argument("--time-budget", type=float, help="time budget of the requests in seconds (default: service default)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random orders and the requests")
+    args = parser.parse_args(argv)
+
+    if args.orders:
+        orders = read_orders(args.orders)
+    elif args.problem_file:
+        inventory = read_inventory(args.problem_file)
+        rng = random.Random(args.seed)
+        orders = [rng.sample(inventory, min(args.order_length, len(inventory))) for _ in range(args.num_orders)]
+    else:
+        parser.error("either --orders or --problem-file is required")
+    if not orders:
+        parser.error("no orders found for {}".format(args.orders))
+
+    report = run_load(args.url, args.problem, orders, args.requests, args.concurrency, args.algorithm, args.time_budget, args.seed)
+    client = Solver_Client(args.url)
+    report["service"] = client.get_stats()
+    client.close()
+    print(json.dumps(report, indent=2))
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,54 +1,344 @@
-import algorithm, hill_climbing
-import numpy as np
-import random
+import algorithm, hill_climbing, psu_coverage
+from abc import ABC, abstractmethod
+import math
+import time
 
 class Simulated_Annealing(algorithm.Algorithm):
-    
-    def __init__(self, psu_dict, order, decode_dict):
+
+    def __init__(self, psu_dict, order, decode_dict, schedule="geometric", steps=None, time_budget=None, initial_temperature=None,
+                 final_temperature=None, patience="auto", polish=True, **kwargs):
         '''
         initialize algorithm object with psu_dict, order list and dict to decode items via parent algorithm class
+        (other keyword arguments are passed on to the parent class)
+            schedule - cooling schedule: name in SCHEDULES ("geometric", "linear", "reheating", "time") or a Schedule object
+            steps - iteration budget (number of proposed moves) of the schedules given by name
+                    (None: 10000, for the "time" schedule no iteration budget, only the time budget)
+            time_budget - seconds of annealing of the "time" schedule
+            initial_temperature - temperature at the start (positive), None: calibrated from random moves of the initial
+                                  state (see calibrate_temperature)
+            final_temperature - temperature at the end of the schedule (positive), None: calibrated (a cost increase of 1
+                                is accepted with probability FINAL_ACCEPTANCE)
+            patience - the annealing stops early if the best cost did not improve for this many steps of the cold part of
+                       the schedule (temperature below COLD_TEMPERATURE, steps at higher temperatures are not counted)
+                       ("auto": a tenth of the iteration budget of the schedule, None: never)
+            polish - if True, hill climbing from the best state found (the result is a local optimum)
         '''
-        super().__init__(psu_dict, order, decode_dict)
+        super().__init__(psu_dict, order, decode_dict, **kwargs)
         self.name = "Simulated Annealing"
+        if isinstance(schedule, str):
+            if schedule not in SCHEDULES:
+                raise ValueError('schedule must be one of {}, not {!r}'.format(", ".join(sorted(SCHEDULES)), schedule))
+            if schedule == "time":
+                if time_budget is None:
+                    raise ValueError('the "time" schedule needs a time_budget')
+                schedule = Time_Schedule(float(time_budget), steps)
+            else:
+                schedule = SCHEDULES[schedule](steps if steps is not None else 10000)
+        self.schedule = schedule
+        for name, temperature in (("initial_temperature", initial_temperature), ("final_temperature", final_temperature)):
+            if temperature is not None and not temperature > 0:
+                raise ValueError("{} must be positive, not {!r}".format(name, temperature))
+        if patience == "auto":
+            patience = max(1, schedule.steps // 10) if schedule.steps is not None else None
+        self.initial_temperature = initial_temperature
+        self.final_temperature = final_temperature
+        self.patience = patience
+        self.polish = polish
+        # results of the last run
+        self.steps = 0
+        self.stopped_early = False
 
 
-    def run(self):
+    def run(self, state=None):
         '''
         method to run the algorithm from the constructed algorithm object
+            parameter: state - state from which to start annealing, None is default, results in random start state
             returns: post precessed result - provided items, number of psus required, result state
         '''
         psu_dict = self.psu_dict
         order = self.order
         decode_dict = self.decode_dict
 
-        # get random initial state 
-        state = self.get_initial_state(psu_dict, order)
+        # get random initial state
+        if state is None:
+            state = self.get_initial_state(psu_dict, order)
 
-        temp = 10000 # starting temperature
+        psus = list(psu_dict.keys())
+        rng = self.rng
+        removal = self.coverage.has_placeholder
 
-        while temp > 0:            
-            # get neighbors of current state
-            idx = np.random.randint(0,len(state))
-            psu = random.choice(list(psu_dict.keys()))
-            
-            # get random neighbor state
-            next_state = state.copy()
-            next_state[idx] = psu
+        # coverage counts of the current state, neighbor costs are computed as delta to the current state (O(1) per move)
+        coverage_state = psu_coverage.Coverage_State(self.coverage, state)
+        cost = coverage_state.cost()
+        stats = self.instrumentation
 
-            # difference between cost of new and current state
-            delta = self.calculate_cost(next_state, psu_dict, order) - self.calculate_cost(state, psu_dict, order)
+        # temperatures: given or calibrated from the cost differences of random moves
+        initial_temperature, final_temperature = self.initial_temperature, self.final_temperature
+        if initial_temperature is None or final_temperature is None:
+            calibrated = calibrate_temperature(coverage_state, psus, rng)
+            initial_temperature = initial_temperature if initial_temperature is not None else calibrated[0]
+            final_temperature = final_temperature if final_temperature is not None else calibrated[1]
+        final_temperature = min(final_temperature, initial_temperature)
+        schedule = self.schedule
+        schedule.start(initial_temperature, final_temperature)
+        # stagnation while the temperature is high is normal, only the cold part of the schedule counts for the patience
+        cold_temperature = get_cold_temperature(initial_temperature, final_temperature)
 
-            if delta > 0:
-                # if random neighbor is better than current state, update curretn state 
-                state = next_state
-            else:
-                # else update with some probability
-                if np.random.random() <= np.exp(delta/temp):
-                    state = next_state
-            
-            temp -= 1
-        
-        # get local maximum of final state via hillclimbing from this state and return it
-        alg = hill_climbing.Hill_Climbing(psu_dict, order, decode_dict)
-        return alg.run(state)
-        
+        best_cost = cost
+        best_state = list(coverage_state.state)
+        stagnation = 0  # cold steps since the best cost improved
+        step = 0
+        self.stopped_early = False
+        start = time.perf_counter()
+        while not self.should_stop():
+            temp = schedule.get_temperature(step, time.perf_counter() - start)
+            if temp is None:
+                break
+
+            # random neighbor of the current state: idx replaced by psu
+            # (half of the proposals are removals, otherwise a PSU is rarely replaced by the placeholder)
+            idx = rng.randrange(len(state))
+            psu = 0 if removal and rng.random() < 0.5 else rng.choice(psus)
+
+            # difference between cost of random neighbor state and current state
+            next_cost = coverage_state.cost_if(idx, psu)
+            delta = next_cost - cost
+
+            # a neighbor that is not worse is always accepted, a worse one with probability exp(-delta/temp)
+            accepted = delta <= 0 or rng.random() < math.exp(-delta / temp)
+            if accepted:
+                coverage_state.apply(idx, psu)
+                cost = next_cost
+            if stats is not None:
+                stats.count("neighbors generated")
+                stats.count("cost evaluations")
+                stats.count("accepted moves", int(accepted))
+
+            improved = cost < best_cost
+            if improved:
+                # the best state is copied only when it improves
+                best_cost = cost
+                best_state = list(coverage_state.state)
+                stagnation = 0
+            elif temp <= cold_temperature:
+                stagnation += 1
+            if schedule.update(improved):
+                stagnation = 0  # the temperature was raised again, patience starts again
+            self.report(coverage_state.state, cost)
+            step += 1
+            if self.patience is not None and stagnation >= self.patience:
+                self.stopped_early = True
+                break
+        self.steps = step
+        if stats is not None and getattr(schedule, "reheats", 0):
+            stats.count("reheats", schedule.reheats)
+
+        if not self.polish:
+            return self.post_processing(best_state, decode_dict, psu_dict, order)
+        # get local optimum of the best state via hill climbing from this state and return it
+        alg = hill_climbing.Hill_Climbing(psu_dict, order, decode_dict, coverage=self.coverage, vectorized=self.vectorized,
+                                          neighborhood=self.neighborhood, deadline=self.deadline, stop_event=self.stop_event,
+                                          callback=self.callback, instrumentation=self.instrumentation)
+        result = alg.run(best_state)
+        self.result_state = alg.result_state
+        return result
+
+
+# acceptance probabilities the temperatures are calibrated for:
+# at the start the average cost increase of a random move, at the end a cost increase of 1 (one more PSU)
+INITIAL_ACCEPTANCE = 0.8
+FINAL_ACCEPTANCE = 0.001
+# the patience of the early stopping counts steps below this multiple of the final temperature (see get_cold_temperature)
+COLD_TEMPERATURE = 5
+
+
+def get_cold_temperature(initial_temperature, final_temperature):
+    '''
+    temperature below which the annealing is in its cold part (early stopping of the patience only counts there):
+    COLD_TEMPERATURE times the final temperature, at most the geometric mean of the initial and final temperature
+    '''
+    return min(COLD_TEMPERATURE * final_temperature, math.sqrt(initial_temperature * final_temperature))
+
+
+def calibrate_temperature(coverage_state, psus, rng, samples=200):
+    '''
+    initial and final temperature from the cost differences of random moves of the current state
+    parameters: coverage_state - psu_coverage.Coverage_State of the initial state
+                psus - candidate PSUs of the moves
+                rng - random number generator (random.Random instance)
+                samples - number of random moves
+    returns: initial temperature - a move with the average cost increase is accepted with probability INITIAL_ACCEPTANCE
+             final temperature - a cost increase of 1 is accepted with probability FINAL_ACCEPTANCE
+    '''
+    cost = coverage_state.cost()
+    length = len(coverage_state.state)
+    increases = []
+    for _ in range(samples):
+        delta = coverage_state.cost_if(rng.randrange(length), rng.choice(psus)) - cost
+        if delta > 0:
+            increases.append(delta)
+    final_temperature = -1 / math.log(FINAL_ACCEPTANCE)
+    if not increases:
+        return max(1.0, final_temperature), final_temperature
+    return max(-(sum(increases) / len(increases)) / math.log(INITIAL_ACCEPTANCE), final_temperature), final_temperature
+
+
+class Schedule(ABC):
+    '''
+    cooling schedule of simulated annealing: temperature of every step, None when the annealing is done
+    (abstract: subclasses implement get_temperature)
+    '''
+
+    def __init__(self, steps=10000):
+        '''
+        parameter: steps - number of steps of the schedule (None: no limit)
+        '''
+        self.steps = steps
+
+    def start(self, initial_temperature, final_temperature):
+        '''
+        called at the start of a run with the initial and final temperature
+        '''
+        self.initial_temperature = initial_temperature
+        self.final_temperature = final_temperature
+
+    @abstractmethod
+    def get_temperature(self, step, elapsed):
+        '''
+        parameters: step - number of the step (starting at 0)
+                    elapsed - seconds since the start of the annealing
+        returns: temperature of the step, None if the schedule is finished
+        '''
+
+    def update(self, improved):
+        '''
+        called after every step
+        parameter: improved - True if the step improved the best cost
+        returns: True if the temperature was raised again (reheat)
+        '''
+        return False
+
+    def get_fraction(self, step):
+        '''
+        returns: fraction of the schedule done after step steps, None if the schedule is finished
+        '''
+        if self.steps is not None and step >= self.steps:
+            return None
+        return step / self.steps if self.steps else 0.0
+
+    def interpolate(self, fraction):
+        '''
+        returns: temperature decreasing geometrically from the initial to the final temperature (fraction 0 to 1)
+        '''
+        return self.initial_temperature * (self.final_temperature / self.initial_temperature) ** fraction
+
+
+class Linear_Schedule(Schedule):
+    '''
+    temperature decreases linearly from the initial to the final temperature in steps steps
+    '''
+
+    def get_temperature(self, step, elapsed):
+        fraction = self.get_fraction(step)
+        if fraction is None:
+            return None
+        return self.initial_temperature + (self.final_temperature - self.initial_temperature) * fraction
+
+
+class Geometric_Schedule(Schedule):
+    '''
+    temperature is multiplied by a constant factor in every step, from the initial to the final temperature in steps steps
+    '''
+
+    def get_temperature(self, step, elapsed):
+        fraction = self.get_fraction(step)
+        if fraction is None:
+            return None
+        return self.interpolate(fraction)
+
+
+class Reheating_Schedule(Schedule):
+    '''
+    adaptive geometric schedule: once the temperature is below reheat times the initial temperature, and the best cost did
+    not improve for reheat_after of these cold steps, the temperature is raised again to reheat times the initial
+    temperature and cools down geometrically to the final temperature in the remaining steps (at most max_reheats times,
+    only while at least cooldown of the steps remain)
+    '''
+
+    def __init__(self, steps=10000, reheat_after=None, reheat=0.5, max_reheats=5, cooldown=0.25):
+        '''
+        parameters: steps - number of steps of the schedule
+                    reheat_after - cold steps without improvement of the best cost after which the temperature is raised
+                                   (None: a tenth of steps)
+                    reheat - fraction of the initial temperature the temperature is raised to
+                    max_reheats - maximum number of reheats per run
+                    cooldown - minimum fraction of the steps left after a reheat (to cool down to the final temperature)
+        '''
+        super().__init__(steps)
+        self.reheat_after = reheat_after if reheat_after is not None else max(1, (steps or 10000) // 10)
+        self.reheat = reheat
+        self.max_reheats = max_reheats
+        self.cooldown = cooldown
+
+    def start(self, initial_temperature, final_temperature):
+        super().start(initial_temperature, final_temperature)
+        # current cooling segment: starts at segment_start (fraction of steps) with segment_temperature, ends at the final
+        # temperature after all steps (a reheat starts a new segment)
+        self.segment_start = 0.0
+        self.segment_temperature = initial_temperature
+        self.fraction = 0.0
+        self.temperature = initial_temperature
+        self.stagnation = 0
+        self.reheats = 0
+
+    def get_temperature(self, step, elapsed):
+        fraction = self.get_fraction(step)
+        if fraction is None:
+            return None
+        self.fraction = fraction
+        progress = (fraction - self.segment_start) / (1.0 - self.segment_start)
+        self.temperature = self.segment_temperature * (self.final_temperature / self.segment_temperature) ** progress
+        return self.temperature
+
+    def update(self, improved):
+        if improved:
+            self.stagnation = 0
+            return False
+        reheat_temperature = self.reheat * self.initial_temperature
+        if self.temperature >= reheat_temperature:
+            return False  # a reheat would not raise the temperature, the stagnation is not counted
+        self.stagnation += 1
+        if self.stagnation >= self.reheat_after and self.reheats < self.max_reheats and 1.0 - self.fraction >= self.cooldown:
+            self.segment_start = self.fraction
+            self.segment_temperature = reheat_temperature
+            self.stagnation = 0
+            self.reheats += 1
+            return True
+        return False
+
+
+class Time_Schedule(Schedule):
+    '''
+    time-budgeted schedule: temperature decreases geometrically with the elapsed time, the annealing ends after time_budget
+    seconds (or after steps steps if steps is given)
+    '''
+
+    def __init__(self, time_budget, steps=None):
+        '''
+        parameters: time_budget - seconds of annealing
+                    steps - optional iteration budget in addition to the time budget
+        '''
+        super().__init__(steps)
+        self.time_budget = time_budget
+
+    def get_temperature(self, step, elapsed):
+        if elapsed >= self.time_budget or (self.steps is not None and step >= self.steps):
+            return None
+        return self.interpolate(elapsed / self.time_budget)
+
+
+# schedules that can be chosen by name (schedule keyword of Simulated_Annealing)
+SCHEDULES = {"linear": Linear_Schedule,
+             "geometric": Geometric_Schedule,
+             "reheating": Reheating_Schedule,
+             "time": Time_Schedule}
@@ -0,0 +1,106 @@
+'''
+generator of synthetic warehouses and orders (same format as the files in files/) for benchmarks
+item popularity follows a Zipf-like distribution: the c-th item is held/ordered with weight 1/(c+1)**skew
+(skew 0: all items equally popular, larger skew: few items held by many PSUs and ordered often)
+all functions are deterministic for a given seed
+'''
+import bisect
+import itertools
+import random
+
+
+def get_cumulative_weights(num_items, skew):
+    '''
+    cumulative popularity weights of the items
+    parameters: num_items - number of items in the inventory
+                skew - exponent of the Zipf-like popularity
+    returns: list of cumulative weights (for bisect)
+    '''
+    return list(itertools.accumulate(1 / (c + 1) ** skew for c in range(num_items)))
+
+
+def sample_items(rng, cum_weights, k):
+    '''
+    sample k distinct items (indices) weighted by popularity
+    parameters: rng - random.Random instance
+                cum_weights - cumulative weights, see get_cumulative_weights
+                k - number of distinct items (at most the number of items)
+    returns: list of k distinct item indices
+    '''
+    total = cum_weights[-1]
+    items = []
+    chosen = set()
+    while len(items) < k:
+        item = bisect.bisect_right(cum_weights, rng.random() * total)
+        item = min(item, len(cum_weights) - 1)  # guard against rounding at the upper end
+        if item not in chosen:
+            chosen.add(item)
+            items.append(item)
+    return items
+
+
+def generate_problem(num_psus, num_items, items_per_psu=(1, 6), skew=1.0, seed=0):
+    '''
+    generate a synthetic warehouse
+    parameters: num_psus - number of PSUs
+                num_items - number of items in the inventory
+                items_per_psu - (min, max) number of distinct items a PSU holds (uniform)
+                skew - popularity skew of the items held by the PSUs (see module docstring)
+                seed - seed of the generator
+    returns: items - item names (index is the numeric encoding)
+             psus - list of item index lists, one per PSU (the PSU id is the position)
+    '''
+    rng = random.Random(seed)
+    cum_weights = get_cumulative_weights(num_items, skew)
+    low, high = items_per_psu
+    items = ["item-{}".format(c) for c in range(num_items)]
+    psus = [sample_items(rng, cum_weights, min(rng.randint(low, high), num_items)) for _ in range(num_psus)]
+    return items, psus
+
+
+def generate_order(num_items, order_length, skew=1.0, seed=0):
+    '''
+    generate a synthetic order of distinct items
+    parameters: num_items - number of items in the inventory
+                order_length - number of distinct items in the order
+                skew - popularity skew of the ordered items (see module docstring)
+                seed - seed of the generator
+    returns: list of item indices
+    '''
+    rng = random.Random(seed)
+    return sample_items(rng, get_cumulative_weights(num_items, skew), min(order_length, num_items))
+
+
+def to_dicts(items, psus):
+    '''
+    dictionaries of a generated warehouse like file_parser.read_problem
+    parameters: items, psus - see generate_problem
+    returns: item encoding dict, item decoding dict, dict of PSUs and their items
+    '''
+    encode_dict = {item: c for c, item in enumerate(items)}
+    decode_dict = dict(enumerate(items))
+    psu_dict = {c: list(psu_items) for c, psu_items in enumerate(psus)}
+    return encode_dict, decode_dict, psu_dict
+
+
+def write_problem(path, items, psus):
+    '''
+    write a generated warehouse as problem file (readable by file_parser.read_problem)
+    parameters: path - path of the file (should contain "problem")
+                items, psus - see generate_problem
+    '''
+    with open(path, "w") as file:
+        file.write(" ".join(items) + " \n\n")
+        for psu_items in psus:
+            file.write(" ".join(items[item] for item in psu_items) + " \n")
+
+
+def write_order(path, items, order):
+    '''
+    write a generated order as order file (readable by file_parser.read_order)
+    parameters: path - path of the file (should contain "order")
+                items - item names, see generate_problem
+                order - list of item indices, see generate_order
+    '''
+    with open(path, "w") as file:
+        file.write(" ".join(items[item] for item in order))
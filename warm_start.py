@@ -0,0 +1,180 @@
+'''
+warm start re-solve of an amended order: instead of searching from scratch, the solution of the previous order is repaired
+(PSUs for the new items are added, PSUs that became redundant are removed) and polished by local search
+'''
+import algorithm, psu_coverage, preprocessing
+
+
+def amend_order(order, added=(), removed=()):
+    '''
+    apply an order diff
+    parameters: order - list of numerically encoded order items
+                added - items added to the order
+                removed - items removed from the order
+    returns: amended order (items of order without the removed ones, followed by the added items not in the order yet)
+    '''
+    removed = set(removed)
+    amended = [item for item in order if item not in removed]
+    present = set(amended)
+    for item in added:
+        if item not in present:
+            present.add(item)
+            amended.append(item)
+    return amended
+
+
+def get_order_diff(old_order, new_order):
+    '''
+    diff of two orders
+    parameters: old_order, new_order - lists of numerically encoded order items
+    returns: added - items of new_order not in old_order, removed - items of old_order not in new_order
+    '''
+    old_items = set(old_order)
+    new_items = set(new_order)
+    return [item for item in dict.fromkeys(new_order) if item not in old_items], \
+           [item for item in dict.fromkeys(old_order) if item not in new_items]
+
+
+def repair_state(coverage, psus, length):
+    '''
+    repair the PSUs of a previous solution for a (changed) order
+    parameters: coverage - psu_coverage.Coverage of the psu_dict and the new order
+                psus - PSUs of the previous solution
+                length - length of the state (number of items in the new order)
+    returns: state - forced PSUs of the coverage and previous PSUs that still provide order items, plus greedily chosen
+                     PSUs for the items they do not provide, without redundant PSUs (every PSU provides an item no other
+                     PSU of the state provides), padded with zeros to length
+    '''
+    masks = coverage.masks
+    # forced PSUs (sole holders of an order item) and previous PSUs that are still candidates and still provide some item
+    # of the new order
+    kept = [psu for psu in dict.fromkeys(coverage.forced + list(psus)) if psu != 0 and masks.get(psu)]
+    covered = 0
+    for psu in kept:
+        covered |= masks[psu]
+
+    # cover the new (uncovered) items, only PSUs holding such an item are candidates
+    candidates = set()
+    for pos in psu_coverage.bit_positions(coverage.full_mask & ~covered):
+        candidates.update(coverage.holders[pos])
+    candidates = sorted(candidates, key=coverage.psu_index.__getitem__)
+    chosen = kept + psu_coverage.greedy_cover(coverage, candidates, covered=covered)
+
+    # remove redundant PSUs, PSUs providing the fewest items first (forced PSUs are never redundant)
+    counts = [0]*coverage.num_items
+    for psu in chosen:
+        for pos in coverage.item_positions[psu]:
+            counts[pos] += 1
+    redundant = set()
+    for psu in sorted(chosen, key=lambda psu: len(coverage.item_positions[psu])):
+        positions = coverage.item_positions[psu]
+        if all(counts[pos] > 1 for pos in positions):
+            redundant.add(psu)
+            for pos in positions:
+                counts[pos] -= 1
+    state = [psu for psu in chosen if psu not in redundant][:length]
+    return state + [0]*(length - len(state))
+
+
+class Warm_Start(algorithm.Algorithm):
+    '''
+    re-solve an amended order starting from the solution of the previous order (repair and local search polish)
+    '''
+
+    def __init__(self, psu_dict, order, decode_dict, previous_state, polish=True, iterations=100, destroy=3, **kwargs):
+        '''
+        initialize algorithm object with psu_dict, order list and dict to decode items via parent algorithm class
+        (other keyword arguments are passed on to the parent class, the neighborhood of the polish is focused by default)
+            previous_state - solution state (or list of PSUs) of the previous order
+            polish - if True, the repaired state is polished by local search: iterations steps of destroy and repair
+                     (destroy random PSUs are removed and the state is repaired, accepted if the cost is not higher),
+                     then hill climbing
+            iterations - number of destroy and repair steps of the polish
+            destroy - number of PSUs removed per destroy and repair step
+        '''
+        kwargs.setdefault("neighborhood", "focused")
+        super().__init__(psu_dict, order, decode_dict, **kwargs)
+        self.name = "Warm Start"
+        self.previous_state = list(previous_state)
+        self.polish = polish
+        self.iterations = iterations
+        self.destroy = destroy
+
+    def run(self):
+        '''
+        method to run the algorithm from the constructed algorithm object
+            returns: post precessed result - provided items, number of psus required, result state
+        '''
+        psu_dict = self.psu_dict
+        order = self.order
+        decode_dict = self.decode_dict
+
+        with self.timed("initial state"):
+            state = repair_state(self.coverage, self.previous_state, len(order))
+        cost = self.calculate_cost(state, psu_dict, order)
+        self.report(state, cost)
+        if self.polish:
+            state, cost = self.destroy_and_repair(state, cost)
+            state = self.hill_climb(state, psu_dict)
+        # return postprocessed result
+        return self.post_processing(state, decode_dict, psu_dict, order)
+
+    def destroy_and_repair(self, state, cost):
+        '''
+        large neighborhood search around a repaired state: remove random PSUs and repair the state (see repair_state),
+        reaches improvements that need more than one slot to change (e.g. two PSUs replaced by one),
+        forced PSUs are pinned (never removed)
+        parameters: state - repaired state
+                    cost - cost of state
+        returns: state, cost - best state found and its cost
+        '''
+        rng = self.rng
+        coverage = self.coverage
+        length = len(state)
+        stats = self.instrumentation
+        pinned = set(coverage.forced)
+        for _ in range(self.iterations):
+            if self.should_stop():
+                break
+            psus = [psu for psu in state if psu != 0]
+            removable = [psu for psu in psus if psu not in pinned]
+            if len(psus) <= 1 or not removable:
+                break
+            removed = set(rng.sample(removable, min(self.destroy, len(psus) - 1, len(removable))))
+            # shuffled, so ties of the redundancy removal of the repair are broken randomly
+            rng.shuffle(psus)
+            candidate = repair_state(coverage, [psu for psu in psus if psu not in removed], length)
+            candidate_cost = coverage.cost(candidate)
+            if stats is not None:
+                stats.count("neighbors generated")
+                stats.count("cost evaluations")
+            if candidate_cost <= cost:
+                if stats is not None:
+                    stats.count("accepted moves")
+                state, cost = candidate, candidate_cost
+                self.report(state, cost)
+        return state, cost
+
+
+def resolve(psu_dict, order, decode_dict, previous_state, added=(), removed=(), item_index=None, **kwargs):
+    '''
+    re-solve an amended order (preprocessing like the GUI and batch mode, then Warm_Start)
+    parameters: psu_dict - dictionary of all PSUs of the problem and their items
+                order - list of numerically encoded items of the previous order
+                decode_dict - dict to decode items
+                previous_state - solution state of the previous order
+                added, removed - order diff (see amend_order)
+                item_index - inverted item index of psu_dict (preprocessing.build_item_index), built if None
+                kwargs - keyword arguments of Warm_Start (e.g. seed, polish)
+    returns: alg - Warm_Start object after the run (the solution is in alg.result_state)
+             result - post processed result of the run
+             new_order - the amended order
+    '''
+    new_order = amend_order(order, added, removed)
+    if item_index is None:
+        item_index = preprocessing.build_item_index(psu_dict)
+    # no reduction of the PSUs: the PSUs of the previous solution stay candidates, the polish only scans the focused neighborhood
+    filtered_psu_dict = preprocessing.filter_psus(psu_dict, new_order, item_index)
+    filtered_psu_dict[0] = []
+    alg = Warm_Start(filtered_psu_dict, new_order, decode_dict, previous_state, **kwargs)
+    return alg, alg.run(), new_order
@@ -0,0 +1,151 @@
+'''
+wave planning: solve a batch (wave) of orders jointly instead of one by one
+a PSU fetched for the wave serves every order of the wave, so the coverage target of the search is the union of the
+order items (same cost, neighborhoods and algorithms as for a single order), afterwards every order is assigned the
+fetched PSUs serving its items and the number of fetches is compared with solving every order on its own
+
+usage: python wave_planning.py files/problem1.txt "files/order*.txt" --algorithm hill-climbing --output wave.json
+'''
+import file_parser, problem_cache, psu_coverage, batch
+import argparse
+import json
+import random
+import sys
+import time
+
+
+def merge_orders(orders):
+    '''
+    coverage target of a wave
+    parameter: orders - list of numerically encoded orders
+    returns: list of the distinct items of all orders (in order of first appearance)
+    '''
+    return list(dict.fromkeys(item for order in orders for item in order))
+
+
+def assign_items(problem, psus, order):
+    '''
+    assign the items of one order to fetched PSUs, using as few of the fetched PSUs as possible for the order
+    (greedy set cover restricted to the fetched PSUs)
+    parameters: problem - problem_cache.Problem (or dictionary of PSUs (key) and the numerically encoded items they hold)
+                psus - list of PSUs fetched for the wave
+                order - list of numerically encoded order items
+    returns: assignment - dict of order item (key) and PSU serving it (value, None if no fetched PSU holds the item)
+    '''
+    fetched = {psu: problem[psu] for psu in psus}
+    coverage = psu_coverage.Coverage(fetched, order)
+    assignment = dict.fromkeys(coverage.items)
+    for psu in psu_coverage.greedy_cover(coverage, psus):
+        for pos in coverage.item_positions[psu]:
+            item = coverage.items[pos]
+            if assignment[item] is None:
+                assignment[item] = psu
+    return assignment
+
+
+def plan_wave(problem, orders, algorithm="hill-climbing", options=None, seed=None, compare=True):
+    '''
+    solve a wave of orders jointly
+    parameters: problem - problem_cache.Problem
+                orders - list of numerically encoded orders
+                algorithm - name of the algorithm (see batch.ALGORITHMS)
+                options - dict of start_states, time_budget, neighborhood and initial_state (see batch.solve), default:
+                          25 start states, 10 sec. time budget, focused neighborhood and greedy initial states
+                          (the union of a wave is a long order, random initial states are far from a good cover)
+                seed - seed from which the seeds of the wave and of the single orders are derived
+                compare - if True every order is also solved on its own with the same algorithm (for the saving report)
+    returns: plan - dict with the fetched PSUs ("psus"), one assignment per order ("assignments", see assign_items)
+                    and the summary of the wave ("report": seed (given or drawn, pass it again to reproduce the plan),
+                    fetches, provided items, visits of the orders to the fetched PSUs and, if compare is set, the fetches
+                    and saving compared with solving every order on its own)
+    '''
+    if options is None:
+        options = {"start_states": 25, "time_budget": 10.0, "neighborhood": "focused", "initial_state": "greedy"}
+    # seeds are derived in order: first the wave, then the single orders (the seed is reported, it reproduces the plan)
+    if seed is None:
+        seed = random.getrandbits(32)
+    seed_rng = random.Random(seed)
+    wave_seed = seed_rng.getrandbits(32)
+    order_seeds = [seed_rng.getrandbits(32) for _ in orders]
+
+    start = time.perf_counter()
+    union = merge_orders(orders)
+    alg, _ = batch.solve(problem, union, algorithm, options, wave_seed)
+    psus = [int(psu) for psu in alg.result_state if psu != 0]
+    assignments = [assign_items(problem, psus, order) for order in orders]
+    duration = time.perf_counter() - start
+
+    single = None
+    if compare:
+        start = time.perf_counter()
+        single = []
+        for order, order_seed in zip(orders, order_seeds):
+            order_alg, _ = batch.solve(problem, order, algorithm, options, order_seed)
+            single.append(sum(1 for psu in order_alg.result_state if psu != 0))
+        single_duration = time.perf_counter() - start
+
+    report = {"orders": len(orders),
+              "distinct items": len(union),
+              "algorithm": algorithm,
+              "seed": seed,
+              "wave fetches": len(psus),
+              "provided items": len(union) - psu_coverage.popcount(alg.coverage.full_mask & ~alg.coverage.covered_mask(psus)),
+              "order visits": sum(len(set(psu for psu in assignment.values() if psu is not None)) for assignment in assignments),
+              "duration [sec.]": round(duration, 4)}
+    if single is not None:
+        report.update({"single order fetches": sum(single),
+                       "saved fetches": sum(single) - len(psus),
+                       "saving [%]": round(100 * (sum(single) - len(psus)) / sum(single), 2) if sum(single) else 0.0,
+                       "single order duration [sec.]": round(single_duration, 4)})
+    return {"psus": psus, "assignments": assignments, "report": report}
+
+
+def main(argv=None):
+    '''
+    command line entry point, returns the exit code
+    '''
+    parser = argparse.ArgumentParser(description="Plan a wave of orders jointly (one PSU set for all orders).")
+    parser.add_argument("problem", help="path of the problem .txt file")
+    parser.add_argument("orders", help='directory of order files or glob pattern, e.g. "files/order*.txt"')
+    parser.add_argument("--algorithm", choices=sorted(batch.ALGORITHMS), default="hill-climbing")
+    parser.add_argument("--start-states", type=int, default=25, help="number of start states for random restart hill climbing and local beam search")
+    parser.add_argument("--time-budget", type=float, default=10.0, help="time budget in seconds for branch and bound")
+    parser.add_argument("--neighborhood", choices=["full", "focused"], default="focused",
+                        help="neighborhood of the hill climbing variants (default focused, the union of a wave is a long order)")
+    parser.add_argument("--initial-state", choices=["random", "greedy"], default="greedy",
+                        help="initial state(s) of the local searches (default greedy)")
+    parser.add_argument("--no-compare", action="store_true", help="do not solve every order on its own (no saving report)")
+    parser.add_argument("--output", help="output .json file with fetched PSUs and per order assignment (default: only the report)")
+    parser.add_argument("--cache-dir", help="directory of the compiled problem cache (default: .problem_cache next to the problem file)")
+    parser.add_argument("--seed", type=int, help="seed of the wave")
+    args = parser.parse_args(argv)
+
+    problem = problem_cache.open_problem(args.problem, args.cache_dir)
+    if problem is None:
+        parser.error("could not read problem file {}".format(args.problem))
+    paths = batch.find_orders(args.orders)
+    orders = []
+    for path in paths:
+        order, _ = file_parser.read_order(path, problem.encode_dict)
+        if order is None:
+            parser.error("could not read order file {}".format(path))
+        orders.append(order)
+    if not orders:
+        parser.error("no order files found for {}".format(args.orders))
+
+    options = {"start_states": args.start_states, "time_budget": args.time_budget, "neighborhood": args.neighborhood,
+               "initial_state": args.initial_state}
+    plan = plan_wave(problem, orders, args.algorithm, options, seed=args.seed, compare=not args.no_compare)
+    print(json.dumps(plan["report"], indent=2))
+
+    if args.output:
+        # assignments with item names: order file - item - PSU serving it
+        assignments = {path: {problem.decode_dict[item]: psu for item, psu in assignment.items()}
+                       for path, assignment in zip(paths, plan["assignments"])}
+        with open(args.output, "w") as file:
+            json.dump({"report": plan["report"], "psus": plan["psus"], "assignments": assignments}, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())